@@ -1,42 +1,153 @@
 import numpy as np
 import random
+from distance_field import DistanceField, UNREACHABLE
+from q_table import QTable
+
+# Packed state codes: ((position * distance_span) + distance) << 9 | neighbourhood mask
+NEIGHBOURHOOD_BITS = 9
+NEIGHBOURHOOD_OFFSETS = [(dx, dy) for dy in range(-1, 2) for dx in range(-1, 2)]
+NEIGHBOURHOOD_MASK_BITS = tuple(1 << bit for bit in range(NEIGHBOURHOOD_BITS))
+
+def pack_state(maze_width, maze_height, x, y, neighbourhood_mask):
+    """Pack a player position and its 3x3 neighbourhood mask into a state code
+    The one definition of the state encoding, shared by AIController and
+    BatchMazeEnv so Q-tables trained on either match the other. Works on plain
+    ints and elementwise on int64 arrays.
+    """
+    manhattan_dist = abs(x - maze_width // 2) + abs(y - maze_height // 2)
+    distance_span = maze_width + maze_height - 1
+    return (((y * maze_width + x) * distance_span + manhattan_dist) << NEIGHBOURHOOD_BITS) | neighbourhood_mask
+
+# Hint predictions remembered per controller before the cache starts over
+PREDICTION_CACHE_SIZE = 4096
+
+# Entries scanned at a time when looking for the n-th tied action
+TIE_SCAN_CHUNK = 65536
+
+def nth_true_index(mask, n):
+    """Get the index of the n-th (0-based) True entry of a boolean array
+    The array is scanned in chunks, so only one chunk's worth of indices is
+    ever materialised.
+    """
+    for start in range(0, len(mask), TIE_SCAN_CHUNK):
+        chunk = mask[start:start + TIE_SCAN_CHUNK]
+        count = np.count_nonzero(chunk)
+        if n < count:
+            return start + int(np.flatnonzero(chunk)[n])
+        n -= count
+    raise IndexError("mask has fewer True entries than requested")
+
+def top_k_actions(q_values, k):
+    """Get the ids of the k highest Q-values, best first, ties in action order
+    Same result as a stable argsort of -q_values cut to k, but the top k are
+    found by partial selection, so the whole row is never sorted.
+    """
+    n = len(q_values)
+    if k >= n:
+        return np.argsort(-q_values, kind='stable')
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    
+    # Everything above the k-th largest value is in; ties at that value fill
+    # the remaining places lowest action id first
+    kth = np.partition(q_values, n - k)[n - k]
+    above = np.flatnonzero(q_values > kth)
+    ties = np.flatnonzero(q_values == kth)[:k - len(above)]
+    chosen = np.concatenate([above, ties])
+    return chosen[np.lexsort((chosen, -q_values[chosen]))]
 
 class AIController:
-    def __init__(self, maze_width, maze_height):
+    def __init__(self, maze_width, maze_height, q_table=None, rng=None):
         self.maze_width = maze_width
         self.maze_height = maze_height
         self.maze = None
+        self.distance_field = None
         self.player_x = 0
         self.player_y = 0
         self.goal_x = maze_width // 2
         self.goal_y = maze_height // 2
         
+        # Manhattan distances to the goal fall in [0, distance_span)
+        self.distance_span = maze_width + maze_height - 1
+        
+        # Random source (anything with the random module's API), global by default
+        self.rng = rng if rng is not None else random
+        
         # Learning parameters
         self.learning_rate = 0.1
         self.discount_factor = 0.9
         self.exploration_rate = 0.3
         
-        # Q-values for maze modifications
-        self.q_values = {}  # (state, action) -> value
+        # Define action space (x, y, new_value) as flat action ids:
+        # id = (x * maze_height + y) * 2 + value, with 0 = wall and 1 = path
+        self.num_actions = maze_width * maze_height * 2
+        action_ids = np.arange(self.num_actions)
+        self.action_value = action_ids % 2
+        self.action_y = (action_ids // 2) % maze_height
+        self.action_x = action_ids // (2 * maze_height)
+        
+        # Q-values for maze modifications, one row of action values per state.
+        # Pass a shared (e.g. persistent) table to keep learning across games.
+        if q_table is None:
+            q_table = QTable(self.num_actions)
+        elif q_table.num_actions != self.num_actions:
+            raise ValueError(f"Q-table has {q_table.num_actions} actions, expected {self.num_actions}")
+        self.q_table = q_table
+        
+        # Valid actions as a boolean mask (player and goal cells are off limits)
+        self.valid_mask = np.ones(self.num_actions, dtype=bool)
+        self._set_cell_valid(self.goal_x, self.goal_y, False)
+        self._set_cell_valid(self.player_x, self.player_y, False)
+        
+        # Scratch mask of the actions tied for the best Q-value, reused by every
+        # choice so planning allocates nothing in proportion to the board
+        self._ties = np.zeros(self.num_actions, dtype=bool)
         
         # State history
         self.state_history = []
         
-        # Define action space (x, y, new_value)
-        self.actions = []
-        for x in range(maze_width):
-            for y in range(maze_height):
-                for value in [0, 1]:  # 0 = wall, 1 = path
-                    self.actions.append((x, y, value))
+        # Cells of one shortest player-to-goal route, rebuilt on demand
+        self._route = None
+        
+        # Hint predictions: (state, k) -> (Q-table row version, predictions). A state
+        # fixes the player cell and so the valid actions; only its row can change.
+        self._prediction_cache = {}
     
     def set_maze(self, maze):
-        """Set the current maze state"""
-        self.maze = np.copy(maze)
+        """Set the current maze state
+        The goal-distance field is built on the first call; later calls only
+        replay the cells that changed into it. Once the AI has a maze, prefer
+        sync_cells(), which does not have to compare the whole board.
+        """
+        if self.maze is None or self.maze.shape != maze.shape:
+            self.maze = np.copy(maze)
+            self.distance_field = DistanceField(self.maze, (self.goal_x, self.goal_y))
+        else:
+            changed = np.argwhere(self.maze != maze)
+            self.maze[...] = maze
+            for y, x in changed:
+                self.distance_field.set_cell(x, y, self.maze[y, x])
+        self._route = None
+    
+    def sync_cells(self, changes):
+        """Bring the AI's maze up to date with (x, y, value) cells that changed"""
+        maze = self.maze
+        for x, y, value in changes:
+            if maze[y, x] != value:
+                maze[y, x] = value
+                self.distance_field.set_cell(x, y, value)
+                self._route = None
     
     def set_player_position(self, x, y):
         """Update the player's position"""
+        # Free the old player cell (unless it is the goal) and lock the new one
+        if (self.player_x, self.player_y) != (self.goal_x, self.goal_y):
+            self._set_cell_valid(self.player_x, self.player_y, True)
+        self._set_cell_valid(x, y, False)
+        
         self.player_x = x
         self.player_y = y
+        self._route = None
         
         # Add current state to history
         current_state = self._get_state()
@@ -47,132 +158,157 @@ class AIController:
             self.state_history.pop(0)
     
     def _get_state(self):
-        """Create a simplified state representation
+        """Create a simplified state representation, packed into one int
         State includes:
         - Player position
         - Distance to goal
-        - Surrounding walls/paths (3x3 area around player)
+        - Surrounding walls/paths (3x3 area around player, one bit per cell)
         """
-        # Flatten the player position and distance to goal
-        manhattan_dist = abs(self.player_x - self.goal_x) + abs(self.player_y - self.goal_y)
-        
-        # Get surroundings (3x3 area around player)
-        surroundings = []
-        for dy in range(-1, 2):
-            for dx in range(-1, 2):
-                nx, ny = self.player_x + dx, self.player_y + dy
-                if 0 <= nx < self.maze_width and 0 <= ny < self.maze_height:
-                    surroundings.append(self.maze[ny][nx])
-                else:
-                    surroundings.append(0)  # Treat out-of-bounds as walls
-        
-        # Combine all state elements into a tuple
-        return (self.player_x, self.player_y, manhattan_dist, tuple(surroundings))
-    
-    def _get_reward(self, state, action, new_state):
-        """Calculate reward for a state-action-new_state transition
+        return self._encode_state(self.maze, self.player_x, self.player_y)
+    
+    def _encode_state(self, maze, x, y):
+        """Pack the state of a player at (x, y) in the given maze into an int"""
+        # Bit k is set if the k-th cell of the 3x3 area (row-major) is a path;
+        # out-of-bounds cells count as walls
+        mask = 0
+        if 0 < x < self.maze_width - 1 and 0 < y < self.maze_height - 1:
+            # Interior: read the whole 3x3 patch with one slice
+            top, middle, bottom = maze[y - 1:y + 2, x - 1:x + 2].tolist()
+            for bit, cell in zip(NEIGHBOURHOOD_MASK_BITS, top + middle + bottom):
+                if cell == 1:
+                    mask |= bit
+        else:
+            for bit, (dx, dy) in zip(NEIGHBOURHOOD_MASK_BITS, NEIGHBOURHOOD_OFFSETS):
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.maze_width and 0 <= ny < self.maze_height and maze[ny, nx] == 1:
+                    mask |= bit
+        
+        return pack_state(self.maze_width, self.maze_height, x, y, mask)
+    
+    def decode_state(self, state):
+        """Unpack a state code into (x, y, manhattan_dist, neighbourhood_mask)"""
+        mask = state & ((1 << NEIGHBOURHOOD_BITS) - 1)
+        position, manhattan_dist = divmod(state >> NEIGHBOURHOOD_BITS, self.distance_span)
+        y, x = divmod(position, self.maze_width)
+        return (x, y, manhattan_dist, mask)
+    
+    def _get_reward(self, action, old_dist, new_dist):
+        """Calculate reward for an action from the player's true distance to the goal
+        before and after it
         Rewards:
         - Positive if action makes it harder for player
         - Negative if action makes it impossible to reach goal
         - Zero otherwise
         """
-        x, y, value = action
-        
         # We want to make the game challenging but not impossible
         # So we reward actions that increase the path length to the goal
         
-        # Extract player position and distance from state tuples
-        _, _, old_dist, _ = state
-        _, _, new_dist, _ = new_state
-        
-        # Did the distance to goal increase?
-        if new_dist > old_dist:
-            return 1.0  # Positive reward
-        
         # Did we make it impossible to reach the goal?
-        # This is a simplified check - in reality you'd use a pathfinding algorithm
-        if value == 0 and self._is_critical_path(x, y):
+        if new_dist == UNREACHABLE:
             return -5.0  # Strong negative reward
         
+        # Did the shortest path to the goal get longer?
+        if old_dist != UNREACHABLE and new_dist > old_dist:
+            return 1.0  # Positive reward
+        
         # Neutral action
         return 0.0
     
     def _is_critical_path(self, x, y):
-        """Check if a position is on the critical path to the goal
-        This is a simplified version - would use pathfinding in a real implementation
+        """Check if a position is on the current shortest route from the player to the goal
+        The route is read off the goal-distance field once and cached until the maze or
+        the player changes, so each check is a set lookup.
         """
-        # Check if this position is directly between player and goal
-        if (min(self.player_x, self.goal_x) <= x <= max(self.player_x, self.goal_x) and
-            min(self.player_y, self.goal_y) <= y <= max(self.player_y, self.goal_y)):
-            return True
-        return False
+        if self._route is None:
+            self._route = set(self.distance_field.route_from(self.player_x, self.player_y))
+        return (x, y) in self._route
+    
+    def _action_id(self, x, y, value):
+        """Get the flat action id of (x, y, value)"""
+        return (x * self.maze_height + y) * 2 + value
+    
+    def _action_tuple(self, action_id):
+        """Get the (x, y, value) tuple of a flat action id"""
+        action_id = int(action_id)
+        value = action_id % 2
+        cell = action_id // 2
+        return (cell // self.maze_height, cell % self.maze_height, value)
+    
+    def _set_cell_valid(self, x, y, valid):
+        """Allow or forbid both actions on one cell"""
+        base = self._action_id(x, y, 0)
+        self.valid_mask[base] = valid
+        self.valid_mask[base + 1] = valid
     
     def _get_valid_actions(self):
-        """Get valid actions in the current state
+        """Get valid actions in the current state as a boolean mask over action ids
         Invalid actions:
         - Modifying player or goal position
-        - Actions that would make the goal unreachable
         """
-        valid_actions = []
-        
-        for action in self.actions:
-            x, y, value = action
-            
-            # Skip player and goal positions
-            if (x == self.player_x and y == self.player_y) or (x == self.goal_x and y == self.goal_y):
-                continue
-            
-            # For now, allow all other actions (in a real implementation,
-            # you'd check if the action makes the goal unreachable)
-            valid_actions.append(action)
-        
-        return valid_actions
+        return self.valid_mask
+    
+    def _random_valid_action(self):
+        """Pick a uniformly random valid action id
+        Only the player and goal cells are masked out, so rejection sampling almost
+        always succeeds on the first draw.
+        """
+        mask = self.valid_mask
+        while True:
+            action_id = self.rng.randrange(self.num_actions)
+            if mask[action_id]:
+                return action_id
+    
+    def _masked_q_values(self, state):
+        """Get the Q-value row of a state with invalid actions set to -inf (None if unseen)"""
+        row = self.q_table.row(state)
+        if row is None:
+            return None
+        return np.where(self.valid_mask, row, -np.inf)
     
     def _choose_action(self, state):
-        """Choose action using epsilon-greedy strategy"""
-        valid_actions = self._get_valid_actions()
-        
+        """Choose action using epsilon-greedy strategy, returning an action id"""
         # Exploration: choose random action
-        if random.random() < self.exploration_rate:
-            return random.choice(valid_actions)
+        if self.rng.random() < self.exploration_rate:
+            return self._random_valid_action()
         
         # Exploitation: choose best action based on Q-values
-        best_value = float('-inf')
-        best_actions = []
-        
-        for action in valid_actions:
-            state_action = (state, action)
-            q_value = self.q_values.get(state_action, 0.0)
-            
-            if q_value > best_value:
-                best_value = q_value
-                best_actions = [action]
-            elif q_value == best_value:
-                best_actions.append(action)
+        row = self.q_table.row(state)
+        if row is None:
+            # Unseen state: every valid action ties at 0.0
+            return self._random_valid_action()
+        
+        # Take the raw row max and drop masked ties; only if the max sits purely on
+        # masked actions do we pay for a full masked copy of the row
+        ties = self._ties
+        np.equal(row, row.max(), out=ties)
+        ties &= self.valid_mask
+        num_ties = np.count_nonzero(ties)
+        if num_ties == 0:
+            q_values = self._masked_q_values(state)
+            np.equal(q_values, q_values.max(), out=ties)
+            num_ties = np.count_nonzero(ties)
         
         # If there are multiple best actions, choose randomly
-        return random.choice(best_actions)
+        return nth_true_index(ties, self.rng.randrange(num_ties))
     
-    def _update_q_value(self, state, action, reward, next_state):
+    def _update_q_value(self, state, action_id, reward, next_state):
         """Update Q-value using Q-learning update rule"""
-        state_action = (state, action)
-        
         # Get current Q-value
-        current_q = self.q_values.get(state_action, 0.0)
+        current_q = self.q_table.get(state, action_id)
         
-        # Get maximum Q-value for next state
+        # Get maximum Q-value for next state (never below 0.0). A state fixes the
+        # player cell, so the masked actions of its row are never updated and stay
+        # at 0.0; they cannot raise this max, and the raw row max is exact.
         next_max_q = 0.0
-        valid_next_actions = self._get_valid_actions()
-        for next_action in valid_next_actions:
-            next_state_action = (next_state, next_action)
-            next_q = self.q_values.get(next_state_action, 0.0)
-            next_max_q = max(next_max_q, next_q)
+        next_row = self.q_table.row(next_state)
+        if next_row is not None:
+            next_max_q = max(next_max_q, float(next_row.max()))
         
         # Q-learning update rule
         new_q = current_q + self.learning_rate * (reward + self.discount_factor * next_max_q - current_q)
         
         # Update Q-value
-        self.q_values[state_action] = new_q
+        self.q_table.set(state, action_id, new_q)
     
     def get_maze_modifications(self):
         """Get AI-generated maze modifications"""
@@ -180,74 +316,98 @@ class AIController:
         current_state = self._get_state()
         
         # Choose actions (2-5 modifications)
-        num_modifications = random.randint(2, 5)
+        num_modifications = self.rng.randint(2, 5)
         modifications = []
         
-        # Copy maze for simulation
-        temp_maze = np.copy(self.maze)
+        # Trial flips only go into the distance field; the overlay keeps the real
+        # value of each cell flipped, so the field can be rolled back at the end
+        field = self.distance_field
+        trial_cells = {}
+        old_dist = field.distance(self.player_x, self.player_y)
         
         for _ in range(num_modifications):
             # Choose an action
-            action = self._choose_action(current_state)
+            action_id = self._choose_action(current_state)
+            action = self._action_tuple(action_id)
             x, y, value = action
             
-            # Apply the action to the temp maze
-            temp_maze[y][x] = value
+            # Only a wall on the current shortest route can lengthen or cut it
+            critical = value == 0 and self._is_critical_path(x, y)
+            
+            # Apply the action to the field
+            trial_cells.setdefault((x, y), self.maze[y, x])
+            field.set_cell(x, y, value)
             
             # Add to modifications list
             modifications.append(action)
             
-            # Get new state
-            new_state = self._simulate_new_state(temp_maze, current_state)
+            # Get new state and the player's new distance to the goal. A wall off the
+            # route leaves both unchanged; otherwise the cached route is stale if it
+            # was cut or a shorter one opened up.
+            new_state = self._simulate_new_state(current_state, action)
+            new_dist = old_dist
+            if critical or value == 1:
+                new_dist = field.distance(self.player_x, self.player_y)
+                if critical or new_dist != old_dist:
+                    self._route = None
             
             # Calculate reward
-            reward = self._get_reward(current_state, action, new_state)
+            reward = self._get_reward(action, old_dist, new_dist)
             
             # Update Q-value
-            self._update_q_value(current_state, action, reward, new_state)
+            self._update_q_value(current_state, action_id, reward, new_state)
             
             # Update current state for next iteration
             current_state = new_state
+            old_dist = new_dist
+        
+        # Roll the field back to the real maze
+        for (x, y), value in trial_cells.items():
+            field.set_cell(x, y, value)
+        if trial_cells:
+            self._route = None
         
         return modifications
     
-    def _simulate_new_state(self, maze, state):
-        """Simulate new state after a maze modification"""
-        player_x, player_y, _, _ = state
-        
-        # Calculate new Manhattan distance
-        manhattan_dist = abs(player_x - self.goal_x) + abs(player_y - self.goal_y)
-        
-        # Get new surroundings
-        surroundings = []
-        for dy in range(-1, 2):
-            for dx in range(-1, 2):
-                nx, ny = player_x + dx, player_y + dy
-                if 0 <= nx < self.maze_width and 0 <= ny < self.maze_height:
-                    surroundings.append(maze[ny][nx])
-                else:
-                    surroundings.append(0)  # Treat out-of-bounds as walls
+    def _simulate_new_state(self, state, action):
+        """Simulate new state after a maze modification
+        Only the 3x3 neighbourhood bits can change, so the flipped cell's bit is
+        patched into the packed state instead of re-reading the maze.
+        """
+        player_x, player_y, _, _ = self.decode_state(state)
+        x, y, value = action
+        dx, dy = x - player_x, y - player_y
+        if abs(dx) > 1 or abs(dy) > 1:
+            return state
         
-        # Return new state
-        return (player_x, player_y, manhattan_dist, tuple(surroundings))
+        bit = 1 << ((dy + 1) * 3 + (dx + 1))
+        return (state | bit) if value == 1 else (state & ~bit)
     
-    def get_modification_prediction(self):
-        """Get prediction of next maze modifications (for hints)"""
+    def get_modification_prediction(self, k=5):
+        """Get prediction of next maze modifications (for hints)
+        Returns the k valid actions with the highest Q-values in the current
+        state. Results are cached per state until that state's row is updated,
+        so asking again without a Q-update in between is a dict lookup.
+        """
         # Use current state to predict likely modifications
         current_state = self._get_state()
-        
-        # Get valid actions
-        valid_actions = self._get_valid_actions()
-        
-        # Sort actions by Q-value
-        action_values = []
-        for action in valid_actions:
-            state_action = (current_state, action)
-            q_value = self.q_values.get(state_action, 0.0)
-            action_values.append((action, q_value))
-        
-        # Sort by Q-value (descending)
-        action_values.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top 5 actions
-        return [action for action, _ in action_values[:5]]
\ No newline at end of file
+        version = self.q_table.row_version(current_state)
+        key = (current_state, k)
+        cached = self._prediction_cache.get(key)
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+        
+        # Rank valid actions by Q-value (descending, ties keep action order). An
+        # unseen state ties every valid action at 0.0. On tiny boards there can
+        # be fewer than k valid actions, and the masked ones must never show up.
+        q_values = self._masked_q_values(current_state)
+        if q_values is None:
+            ranked = np.flatnonzero(self.valid_mask)[:k]
+        else:
+            ranked = top_k_actions(q_values, min(k, int(np.count_nonzero(self.valid_mask))))
+        predictions = [self._action_tuple(action_id) for action_id in ranked]
+        
+        if len(self._prediction_cache) >= PREDICTION_CACHE_SIZE:
+            self._prediction_cache.clear()
+        self._prediction_cache[key] = (version, predictions)
+        return list(predictions)
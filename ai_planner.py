@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AIPlanner:
+    """Plans the AI's maze modifications on a worker thread
+
+    The simulation is switched to deferred AI turns, so step() only counts the
+    turns that are due. From then on the AIController is used from the worker
+    thread alone. Player moves, maze syncs and planning run there in submission
+    order, so every plan is made against the controller's own snapshot of the
+    maze. update() is called between frames: it applies a finished plan to the
+    simulation in one go, then sends the cells it changed back to the worker.
+
+    With speculative planning the next modification set is started as soon as
+    the previous one was applied. It is then usually ready when the turn comes,
+    at the price of being planned from where the player stood a few moves earlier.
+    """
+
+    def __init__(self, sim, speculative=True, on_ready=None):
+        self.sim = sim
+        self.speculative = speculative
+        self.on_ready = on_ready  # Called from the worker thread when a plan finishes
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-planner")
+        self.plan = None  # Future of the next modification set
+        self.synced_position = None
+
+        sim.defer_ai = True
+
+    def start(self):
+        """Begin planning for the simulation's current game (call after sim.reset())"""
+        self.synced_position = self.sim.player.get_position()
+        if self.speculative:
+            self._request_plan()
+
+    def cancel(self):
+        """Wait for the worker to go idle and drop any plan (call before sim.reset())"""
+        self.executor.submit(lambda: None).result()
+        self.plan = None
+
+    def shutdown(self):
+        """Stop the worker thread"""
+        self.executor.shutdown(wait=True)
+        self.plan = None
+
+    def call(self, function, *args):
+        """Run a function against the controller on the worker thread and wait for it
+
+        For occasional reads such as hints; it waits behind a running plan.
+        """
+        self._sync_position()
+        return self.executor.submit(function, *args).result()
+
+    def predict(self):
+        """Start a hint prediction on the worker thread and return its future
+
+        It runs after everything already queued, so it sees the latest position
+        and maze, and never blocks the caller behind a running plan.
+        """
+        self._sync_position()
+        future = self.executor.submit(self.sim.ai_controller.get_modification_prediction)
+        if self.on_ready is not None:
+            future.add_done_callback(lambda _: self.on_ready())
+        return future
+
+    def update(self):
+        """Apply a finished plan if an AI turn is due
+
+        Returns True if the maze was modified.
+        """
+        sim = self.sim
+        self._sync_position()
+        if sim.pending_ai_turns == 0 or sim.won:
+            return False
+
+        if self.plan is None:
+            self._request_plan()
+            return False
+        if not self.plan.done():
+            return False
+
+        modifications = self.plan.result()
+        self.plan = None
+        sim.pending_ai_turns -= 1
+        with sim.profiler.phase("apply_ai_modifications"):
+            sim.apply_ai_modifications(modifications)
+
+        # Let the AI see the maze it actually got
+        self.executor.submit(sim.ai_controller.sync_cells, sim.pop_maze_changes())
+
+        if sim.pending_ai_turns or self.speculative:
+            self._request_plan()
+        return True
+
+    def _plan(self, controller):
+        """Worker side of a plan"""
+        with self.sim.profiler.phase("get_maze_modifications"):
+            return controller.get_maze_modifications()
+
+    def _sync_position(self):
+        """Queue the player's latest position for the controller"""
+        position = self.sim.player.get_position()
+        if position != self.synced_position:
+            self.executor.submit(self.sim.ai_controller.set_player_position, *position)
+            self.synced_position = position
+
+    def _request_plan(self):
+        """Start planning the next modification set"""
+        self._sync_position()
+        self.plan = self.executor.submit(self._plan, self.sim.ai_controller)
+        if self.on_ready is not None:
+            self.plan.add_done_callback(lambda _: self.on_ready())
@@ -0,0 +1,497 @@
+import random
+
+import numpy as np
+
+from ai_controller import NEIGHBOURHOOD_OFFSETS, pack_state
+from maze_generator import MazeGenerator
+from reachability import NEIGHBOR_OFFSETS, ReachabilityTracker
+from simulation import ACTION_DELTAS, StepResult, TILE_NONE, TILE_TRAP, TILE_TELEPORTER, TILE_SHORTCUT
+
+ACTION_DX = np.array([dx for dx, _ in ACTION_DELTAS])
+ACTION_DY = np.array([dy for _, dy in ACTION_DELTAS])
+
+# Special tile slots of a board, in MazeSimulation's placement order:
+# 3 traps, 2 teleporter pairs (both ends), 2 shortcuts
+TRAP_SLOTS = slice(0, 3)
+TELEPORTER_SLOTS = slice(3, 7)
+SHORTCUT_SLOTS = slice(7, 9)
+NUM_SLOTS = 9
+SLOT_TILES = np.array([TILE_TRAP] * 3 + [TILE_TELEPORTER] * 4 + [TILE_SHORTCUT] * 2, dtype=np.uint8)
+
+# The 8 cells around a cell, in order around the ring
+RING_OFFSETS = ((0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1))
+
+
+def _ring_safe_table():
+    """For each 8-bit mask of open ring cells: are the open orthogonal neighbours
+    all joined through the ring? If so, walling the middle cell cannot cut any route.
+    """
+    table = np.zeros(1 << len(RING_OFFSETS), dtype=bool)
+    for mask in range(len(table)):
+        is_open = [(mask >> bit) & 1 for bit in range(len(RING_OFFSETS))]
+        if all(is_open):
+            table[mask] = True
+            continue
+
+        # Walk the ring from a closed cell, numbering the runs of open cells
+        runs = set()
+        run = -1
+        was_open = False
+        first = is_open.index(0)
+        for step in range(1, len(is_open) + 1):
+            bit = (first + step) % len(is_open)
+            if is_open[bit] and not was_open:
+                run += 1
+            if is_open[bit] and bit % 2 == 0:
+                runs.add(run)
+            was_open = is_open[bit]
+        table[mask] = len(runs) <= 1
+    return table
+
+
+RING_SAFE = _ring_safe_table()
+
+# Chance that a tile kind moves on an AI turn, then that each tile of it does
+# (the same odds as MazeSimulation.update_special_tiles)
+TRAP_MOVE_ODDS = (0.3, 0.5)
+TELEPORTER_MOVE_ODDS = (0.2, 0.3)
+SHORTCUT_MOVE_ODDS = (0.25, 0.4)
+
+
+class BatchMazeEnv:
+    """N MindMaze games held as arrays and stepped together with NumPy
+
+    Boards live in one (N, H, W) uint8 tensor with a matching special-tile layer;
+    player positions, turn counts and win flags are length-N arrays. step()
+    applies one move per board with the same rules as MazeSimulation.step:
+    teleporters, then traps, then shortcuts, then the goal. Boards whose AI turn
+    falls due take their modification sets through apply_ai_modifications, which
+    follows MazeSimulation.apply_ai_modifications.
+
+    Walls are rejected exactly when MazeSimulation's ReachabilityTracker would
+    reject them. Each board keeps a witness: a connected set of open cells
+    holding the player and the goal (the player's trail is added as they walk).
+    A wall off the witness cannot cut the route and is applied straight away.
+    Neither can a wall whose open neighbours are joined around it (a 256-entry
+    table lookup on the surrounding ring); the ring then joins the witness. Only
+    the remaining walls run a BFS, batched over every board that needs one.
+    Route repair after the goal was cut off is rare and reuses ReachabilityTracker.
+
+    Special tiles move with MazeSimulation's odds onto uniformly drawn free
+    cells, but from a NumPy random stream, so a board does not replay the same
+    tile moves as a MazeSimulation with the same seed.
+    """
+
+    def __init__(self, num_envs, maze_width=15, maze_height=15, ai_modify_frequency=3, seed=None,
+                 auto_reset=True):
+        self.num_envs = num_envs
+        self.maze_width = maze_width
+        self.maze_height = maze_height
+        self.ai_modify_frequency = ai_modify_frequency
+
+        # Boards that reach the goal start a new game at the end of step()
+        self.auto_reset = auto_reset
+
+        # Mazes come from the usual generator; tile placement and moves draw from NumPy
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        self.maze_generator = MazeGenerator(maze_width, maze_height, rng=self.rng)
+
+        # Start (top-left) and goal (center) as flat cell ids, y * width + x
+        self.goal_x = maze_width // 2
+        self.goal_y = maze_height // 2
+        self.start_cell = 0
+        self.goal_cell = self.goal_y * maze_width + self.goal_x
+
+        n = num_envs
+        cells = maze_width * maze_height
+        self.envs = np.arange(n)
+        self.mazes = np.zeros((n, maze_height, maze_width), dtype=np.uint8)
+        self.tiles = np.zeros((n, maze_height, maze_width), dtype=np.uint8)
+
+        # Flat (N, H * W) views of the layers above, for per-board cell lookups
+        self.maze_cells = self.mazes.reshape(n, cells)
+        self.tile_cells = self.tiles.reshape(n, cells)
+
+        # Teleporter partner of each cell (-1 elsewhere) and the cell of each tile slot
+        self.partner = np.full((n, cells), -1, dtype=np.int64)
+        self.slots = np.zeros((n, NUM_SLOTS), dtype=np.int64)
+
+        self.player_x = np.zeros(n, dtype=np.int64)
+        self.player_y = np.zeros(n, dtype=np.int64)
+        self.turn_count = np.zeros(n, dtype=np.int64)
+        self.won = np.zeros(n, dtype=bool)
+
+        # Mirrors ReachabilityTracker.is_reachable(), including its lag: once a
+        # board is cut off it stays so until the next AI turn repairs it
+        self.connected = np.zeros(n, dtype=bool)
+        self.witness = np.zeros((n, cells), dtype=bool)
+
+        self.reset()
+
+    def reset(self, envs=None):
+        """Start new games on the given boards (all by default)"""
+        envs = self.envs if envs is None else np.asarray(envs)
+        for i in envs:
+            self.mazes[i] = self.maze_generator.generate("uint8")
+
+        self.player_x[envs] = 0
+        self.player_y[envs] = 0
+        self.turn_count[envs] = 0
+        self.won[envs] = False
+        self.tiles[envs] = TILE_NONE
+        self.partner[envs] = -1
+
+        # Every tile goes on a distinct open cell that is not start or goal
+        free = self.maze_cells[envs] == 1
+        free[:, self.start_cell] = False
+        free[:, self.goal_cell] = False
+        cells, enough = self._sample_free_cells(free, NUM_SLOTS)
+        if not enough.all():
+            raise ValueError("maze has too few open cells for the special tiles")
+        self.slots[envs] = cells
+        self.tile_cells[envs[:, None], cells] = SLOT_TILES
+        self._link_teleporters(envs)
+
+        self.connected[envs] = self._trace_routes(envs)
+
+    def load_simulation(self, index, sim):
+        """Copy the game state of a MazeSimulation of the same size into board index"""
+        if (sim.maze_width, sim.maze_height, sim.ai_modify_frequency) != (
+                self.maze_width, self.maze_height, self.ai_modify_frequency):
+            raise ValueError("simulation does not match the batch's board size or AI frequency")
+
+        width = self.maze_width
+        self.mazes[index] = sim.maze
+        self.tiles[index] = sim.tiles
+        self.partner[index] = -1
+        for (x, y), (px, py) in sim.teleporter_partner.items():
+            self.partner[index, y * width + x] = py * width + px
+        positions = sim.traps + [pos for pair in sim.teleporters for pos in pair] + sim.shortcuts
+        self.slots[index] = [y * width + x for x, y in positions]
+
+        self.player_x[index] = sim.player.x
+        self.player_y[index] = sim.player.y
+        self.turn_count[index] = sim.turn_count
+        self.won[index] = sim.won
+
+        self.connected[index] = sim.reachability.is_reachable()
+        self.witness[index] = False
+        if sim.reachability.path is not None:
+            self.witness[index, [y * width + x for x, y in sim.reachability.path]] = True
+
+    def step(self, actions, modifications=None):
+        """Apply one action (MOVE_UP/DOWN/LEFT/RIGHT) per board
+
+        If modifications is given, an (N, K, 3) array of (x, y, value) flips, the
+        boards whose AI turn falls due on this step apply their row of it (pad
+        rows with x = -1). Returns a StepResult of length-N boolean arrays; won
+        is read before boards are auto-reset.
+        """
+        actions = np.asarray(actions)
+        width, height = self.maze_width, self.maze_height
+
+        # Moves into open, in-bounds cells go ahead
+        target_x = self.player_x + ACTION_DX[actions]
+        target_y = self.player_y + ACTION_DY[actions]
+        moving = self._can_move(self.envs, target_x, target_y).nonzero()[0]
+        moved = np.zeros(self.num_envs, dtype=bool)
+        moved[moving] = True
+
+        prev = self.player_y[moving] * width + self.player_x[moving]
+        cell = target_y[moving] * width + target_x[moving]
+        self.turn_count[moving] += 1
+
+        # Teleporters, then traps, then shortcuts, as in MazeSimulation.step
+        teleported = self.tile_cells[moving, cell] == TILE_TELEPORTER
+        cell[teleported] = self.partner[moving[teleported], cell[teleported]]
+        trapped = self.tile_cells[moving, cell] == TILE_TRAP
+        cell[trapped] = prev[trapped]
+
+        # A step to a neighbouring cell keeps the witness connected
+        walked = ~teleported
+        self.witness[moving[walked], cell[walked]] = True
+
+        shortcut = self.tile_cells[moving, cell] == TILE_SHORTCUT
+        if shortcut.any():
+            cell[shortcut] = self._take_shortcuts(moving[shortcut], cell[shortcut])
+
+        self.player_y[moving], self.player_x[moving] = np.divmod(cell, width)
+        self.won[moving] |= cell == self.goal_cell
+
+        # A teleport can land outside the goal's component, and a player leaving
+        # a walled-in teleporter tile cannot count it as part of their route
+        left_wall = self.maze_cells[moving, prev] != 1
+        jumped = moving[(teleported | left_wall) & self.connected[moving]]
+        if len(jumped):
+            self.connected[jumped] = self._trace_routes(jumped)
+
+        ai_turn = np.zeros(self.num_envs, dtype=bool)
+        ai_turn[moving] = self.turn_count[moving] % self.ai_modify_frequency == 0
+        if modifications is not None:
+            due = ai_turn.nonzero()[0]
+            if len(due):
+                self.apply_ai_modifications(due, np.asarray(modifications)[due])
+
+        won = self.won.copy()
+        if self.auto_reset and won.any():
+            self.reset(won.nonzero()[0])
+        return StepResult(moved, ai_turn, won)
+
+    def apply_ai_modifications(self, envs, modifications):
+        """Apply one AI turn to each of the given boards
+
+        modifications is a (len(envs), K, 3) array of (x, y, value) flips, applied
+        in order; out-of-bounds rows are skipped. Then cut-off boards get their
+        route repaired and special tiles move.
+        """
+        envs = np.asarray(envs)
+        modifications = np.asarray(modifications)
+        width, height = self.maze_width, self.maze_height
+
+        for k in range(modifications.shape[1]):
+            x, y, value = modifications[:, k, 0], modifications[:, k, 1], modifications[:, k, 2]
+            cell = y * width + x
+
+            # Don't modify start, goal, or player position
+            player = self.player_y[envs] * width + self.player_x[envs]
+            valid = ((x >= 0) & (x < width) & (y >= 0) & (y < height) &
+                     (cell != self.start_cell) & (cell != self.goal_cell) & (cell != player))
+            flip_envs, flip_cells, flip_values = envs[valid], cell[valid], value[valid]
+
+            # Only a wall on the witness of a connected board can cut the route
+            walling = (flip_values != 1) & (self.maze_cells[flip_envs, flip_cells] == 1)
+            checked = walling & self.connected[flip_envs] & self.witness[flip_envs, flip_cells]
+            self.maze_cells[flip_envs, flip_cells] = flip_values
+
+            if not checked.any():
+                continue
+            check_envs, check_cells = flip_envs[checked], flip_cells[checked]
+
+            # Walls with a way around them on the ring are safe
+            ring = self._ring_masks(check_envs, check_cells)
+            safe = RING_SAFE[ring]
+            if safe.any():
+                self._reroute_witness(check_envs[safe], check_cells[safe], ring[safe])
+                check_envs, check_cells = check_envs[~safe], check_cells[~safe]
+
+            if len(check_envs):
+                rejected = ~self._trace_routes(check_envs)
+                self.maze_cells[check_envs[rejected], check_cells[rejected]] = 1
+
+        # Ensure there's always a path to the goal
+        for i in envs[~self.connected[envs]]:
+            tracker = ReachabilityTracker(self.mazes[i], (int(self.player_x[i]), int(self.player_y[i])),
+                                          (self.goal_x, self.goal_y))
+            tracker.repair()
+            self.witness[i] = False
+            self.witness[i, [y * width + x for x, y in tracker.path]] = True
+            self.connected[i] = True
+
+        self.update_special_tiles(envs)
+
+    def update_special_tiles(self, envs):
+        """Move some of the given boards' special tiles to random free cells"""
+        n = len(envs)
+        width = self.maze_width
+
+        # Decide which tiles move this turn
+        kind_rolls = self.np_rng.random((n, 3))
+        tile_rolls = self.np_rng.random((n, 7))
+        moving_traps = (kind_rolls[:, :1] < TRAP_MOVE_ODDS[0]) & (tile_rolls[:, 0:3] < TRAP_MOVE_ODDS[1])
+        moving_pairs = (kind_rolls[:, 1:2] < TELEPORTER_MOVE_ODDS[0]) & (tile_rolls[:, 3:5] < TELEPORTER_MOVE_ODDS[1])
+        moving_shortcuts = (kind_rolls[:, 2:] < SHORTCUT_MOVE_ODDS[0]) & (tile_rolls[:, 5:7] < SHORTCUT_MOVE_ODDS[1])
+        moving = np.concatenate([moving_traps, np.repeat(moving_pairs, 2, axis=1), moving_shortcuts], axis=1)
+
+        count = moving.sum(axis=1)
+        envs, moving, count = envs[count > 0], moving[count > 0], count[count > 0]
+        if len(envs) == 0:
+            return
+
+        # Sample every new cell while the old tiles are still down
+        free = (self.maze_cells[envs] == 1) & (self.tile_cells[envs] == TILE_NONE)
+        free[:, self.start_cell] = False
+        free[:, self.goal_cell] = False
+        free[np.arange(len(envs)), self.player_y[envs] * width + self.player_x[envs]] = False
+        cells, _ = self._sample_free_cells(free, count.max())
+
+        # A board too full to move everything moves nothing this turn
+        fits = free.sum(axis=1) >= count
+        envs, moving, cells = envs[fits], moving[fits], cells[fits]
+
+        # The i-th moving slot of a board takes its i-th sampled cell
+        rank = np.maximum(np.cumsum(moving, axis=1) - 1, 0)
+        rows, slots = moving.nonzero()
+        boards = envs[rows]
+        old = self.slots[boards, slots]
+        new = cells[rows, rank[rows, slots]]
+
+        self.tile_cells[boards, old] = TILE_NONE
+        self.partner[boards, old] = -1
+        self.tile_cells[boards, new] = SLOT_TILES[slots]
+        self.slots[boards, slots] = new
+        self._link_teleporters(envs[moving[:, TELEPORTER_SLOTS].any(axis=1)])
+
+    def encode_states(self):
+        """Each board's AI state code, packed like AIController._get_state"""
+        x, y = self.player_x, self.player_y
+
+        # Bit k is set if the k-th cell of the 3x3 area is a path; out of bounds is a wall
+        masks = np.zeros(self.num_envs, dtype=np.int64)
+        for bit, (dx, dy) in enumerate(NEIGHBOURHOOD_OFFSETS):
+            path = self._can_move(self.envs, x + dx, y + dy)
+            masks |= path.astype(np.int64) << bit
+
+        return pack_state(self.maze_width, self.maze_height, x, y, masks)
+
+    def _can_move(self, envs, x, y):
+        """Which of the (x, y) cells, one per board, are in bounds and open"""
+        width, height = self.maze_width, self.maze_height
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        cell = np.clip(y, 0, height - 1) * width + np.clip(x, 0, width - 1)
+        return inside & (self.maze_cells[envs, cell] == 1)
+
+    def _ring_masks(self, envs, cells):
+        """8-bit masks of the open cells around the given cells (the player's cell counts as open)"""
+        width = self.maze_width
+        y, x = np.divmod(cells, width)
+        player = self.player_y[envs] * width + self.player_x[envs]
+        masks = np.zeros(len(envs), dtype=np.intp)
+        for bit, (dx, dy) in enumerate(RING_OFFSETS):
+            is_open = self._can_move(envs, x + dx, y + dy) | (cells + dy * width + dx == player)
+            masks |= is_open.astype(np.intp) << bit
+        return masks
+
+    def _reroute_witness(self, envs, cells, rings):
+        """Swap walled cells in the witness for the open ring around them"""
+        width = self.maze_width
+        self.witness[envs, cells] = False
+        for bit, (dx, dy) in enumerate(RING_OFFSETS):
+            ring_open = (rings >> bit) & 1 == 1
+            self.witness[envs[ring_open], cells[ring_open] + dy * width + dx] = True
+
+    def _take_shortcuts(self, envs, cells):
+        """Walk players standing on a shortcut up to 3 cells towards the goal
+
+        Same walk as MazeSimulation.check_shortcut: step along the axis with the
+        larger distance left, try the other axis if blocked, stop if both are.
+        Returns the new cells.
+        """
+        y, x = np.divmod(cells, self.maze_width)
+        dx = self.goal_x - x
+        dy = self.goal_y - y
+        steps = np.minimum(3, np.abs(dx) + np.abs(dy))
+        going = np.ones(len(envs), dtype=bool)
+
+        for i in range(3):
+            going &= steps > i
+            if not going.any():
+                break
+            horizontal = np.abs(dx) > np.abs(dy)
+            step_x = np.where(dx > 0, 1, -1)
+            step_y = np.where(dy > 0, 1, -1)
+
+            first_x = np.where(horizontal, step_x, 0)
+            first_y = np.where(horizontal, 0, step_y)
+            second_x = np.where(horizontal, 0, step_x)
+            second_y = np.where(horizontal, step_y, 0)
+            first_ok = self._can_move(envs, x + first_x, y + first_y)
+            second_ok = self._can_move(envs, x + second_x, y + second_y)
+
+            move_x = np.where(first_ok, first_x, np.where(second_ok, second_x, 0)) * going
+            move_y = np.where(first_ok, first_y, np.where(second_ok, second_y, 0)) * going
+            going &= first_ok | second_ok
+            x += move_x
+            y += move_y
+            dx -= move_x
+            dy -= move_y
+            self.witness[envs[going], y[going] * self.maze_width + x[going]] = True
+
+        return y * self.maze_width + x
+
+    def _sample_free_cells(self, free, k):
+        """Draw k distinct free cells per row of free, in random order
+
+        Returns (cells, enough): an (n, k) array of flat cell ids and whether
+        each row had k free cells to draw from.
+        """
+        keys = self.np_rng.random(free.shape)
+        keys[~free] = 2.0
+        cells = np.argpartition(keys, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(keys, cells, axis=1), axis=1)
+        return np.take_along_axis(cells, order, axis=1), free.sum(axis=1) >= k
+
+    def _link_teleporters(self, envs):
+        """Point each teleporter end of the given boards at its partner"""
+        for first in range(TELEPORTER_SLOTS.start, TELEPORTER_SLOTS.stop, 2):
+            a = self.slots[envs, first]
+            b = self.slots[envs, first + 1]
+            self.partner[envs, a] = b
+            self.partner[envs, b] = a
+
+    def _trace_routes(self, envs):
+        """BFS from each board's player to the goal, in lockstep over all the boards
+
+        Returns a boolean array of which boards reach the goal; each of those
+        gets one shortest route as its new witness. Boards are searched with a
+        ring of walls around them, flattened, so neighbours are fixed offsets.
+        """
+        n = len(envs)
+        width, height = self.maze_width, self.maze_height
+        stride = width + 2
+        neighbours = np.array([dy * stride + dx for dx, dy in NEIGHBOR_OFFSETS])
+        start = (self.player_y[envs] + 1) * stride + self.player_x[envs] + 1
+        goal = (self.goal_y + 1) * stride + self.goal_x + 1
+        rows = np.arange(n)
+
+        unvisited = np.zeros((n, height + 2, stride), dtype=bool)
+        unvisited[:, 1:-1, 1:-1] = self.mazes[envs] == 1
+        unvisited = unvisited.reshape(n, -1)
+        unvisited[rows, start] = False
+        frontier = np.zeros_like(unvisited)
+        frontier[rows, start] = True
+        dist = np.full(unvisited.shape, -1, dtype=np.int32)
+        dist[rows, start] = 0
+        reached = start == goal
+
+        # Expand the boards still searching one ring at a time
+        active = (~reached).nonzero()[0]
+        frontier, unvisited = frontier[active], unvisited[active]
+        d = 0
+        while len(active):
+            d += 1
+            grown = np.zeros_like(frontier)
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            grown[:, stride:] |= frontier[:, :-stride]
+            grown[:, :-stride] |= frontier[:, stride:]
+            grown &= unvisited
+            unvisited ^= grown
+
+            boards, cells = grown.nonzero()
+            dist[active[boards], cells] = d
+
+            hit = grown[:, goal]
+            reached[active[hit]] = True
+            alive = ~hit & grown.any(axis=1)
+            active, frontier, unvisited = active[alive], grown[alive], unvisited[alive]
+
+        # Walk back from the goal along decreasing distances to rebuild each witness
+        routes = reached.nonzero()[0]
+        dist = dist[routes]
+        witness = np.zeros((len(routes), width * height), dtype=bool)
+        rows = np.arange(len(routes))
+        cell = np.full(len(routes), goal)
+        remaining = dist[rows, goal]
+        while True:
+            witness[rows, (cell // stride - 1) * width + cell % stride - 1] = True
+            walking = remaining > 0
+            if not walking.any():
+                break
+            rows, cell, remaining = rows[walking], cell[walking], remaining[walking] - 1
+            candidates = cell[:, None] + neighbours
+            step = np.argmax(dist[rows[:, None], candidates] == remaining[:, None], axis=1)
+            cell = candidates[np.arange(len(rows)), step]
+
+        self.witness[envs[routes]] = witness
+        return reached
@@ -0,0 +1,227 @@
+"""Benchmarks for maze generation, AI turns, path repair and rendering
+
+Runs offscreen under the SDL dummy video driver. Examples:
+
+    python benchmark.py --sizes 15 64 256 1024 --output before.json
+    python benchmark.py --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+# Must be set before pygame is imported anywhere
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from ai_controller import AIController
+from main import MindMazeGame
+from maze_generator import MazeGenerator
+
+DEFAULT_SIZES = [15, 64, 256, 1024]
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+
+def bench_generate(size):
+    """MazeGenerator.generate on a size x size board"""
+    generator = MazeGenerator(size, size)
+
+    def run():
+        generator.generate()
+
+    return None, run
+
+
+def bench_ai_turn(size):
+    """AIController.get_maze_modifications with the player at the start"""
+    maze = MazeGenerator(size, size).generate()
+    controller = AIController(size, size)
+    controller.set_maze(maze)
+    controller.set_player_position(0, 0)
+
+    def run():
+        controller.get_maze_modifications()
+
+    return None, run
+
+
+def bench_repair(size, game):
+    """MindMazeGame.ensure_path_to_goal after the player-to-goal route was cut"""
+    sim = game.sim
+
+    def setup():
+        # Wall in the goal behind the tracker's back, so the timed call has a
+        # real repair to do
+        goal_x, goal_y = sim.goal_pos
+        for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+            x, y = goal_x + dx, goal_y + dy
+            if 0 <= x < size and 0 <= y < size and (x, y) != sim.player.get_position():
+                sim.maze[y, x] = 0
+        sim.reachability.reset()
+
+    def run():
+        game.ensure_path_to_goal()
+
+    return setup, run
+
+
+def bench_draw(size, game):
+    """MindMazeGame.draw_maze into the offscreen display, every chunk already cached"""
+    def run():
+        game.draw_maze()
+
+    return None, run
+
+
+def bench_draw_cold(size, game):
+    """MindMazeGame.draw_maze with an empty chunk cache, so every visible chunk is rendered"""
+    def setup():
+        game.maze_renderer.clear()
+
+    def run():
+        game.draw_maze()
+
+    return setup, run
+
+
+def measure(setup, run, min_time, max_iterations, warmup=1):
+    """Time run() repeatedly and return per-call latencies in seconds"""
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        run()
+
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_iterations:
+        if setup is not None:
+            setup()
+        begin = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - begin)
+        if time.perf_counter() - started >= min_time and len(latencies) >= 3:
+            break
+    return latencies
+
+
+def peak_memory(setup, run):
+    """Peak bytes allocated (Python and NumPy) during one call"""
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(case, size, latencies, peak):
+    """Build the JSON record of one case"""
+    ordered = np.sort(np.asarray(latencies))
+    total = float(ordered.sum())
+    return {
+        "case": case,
+        "size": size,
+        "iterations": len(ordered),
+        "ops_per_sec": len(ordered) / total if total > 0 else float("inf"),
+        "mean_ms": total / len(ordered) * 1000,
+        "p50_ms": float(np.percentile(ordered, 50)) * 1000,
+        "p99_ms": float(np.percentile(ordered, 99)) * 1000,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_benchmarks(sizes, cases, min_time, max_iterations, seed):
+    """Run every selected case at every size"""
+    results = []
+    for size in sizes:
+        random.seed(seed)
+        game = None
+        if "repair" in cases or "draw" in cases or "draw_cold" in cases:
+            # No background planner: its thread would compete with the timed sections
+            game = MindMazeGame(q_table_path=None, maze_width=size, maze_height=size, background_ai=False)
+            game.game_state = "playing"
+
+        for case in cases:
+            if case == "generate":
+                setup, run = bench_generate(size)
+            elif case == "ai_turn":
+                setup, run = bench_ai_turn(size)
+            elif case == "repair":
+                setup, run = bench_repair(size, game)
+            elif case == "draw":
+                setup, run = bench_draw(size, game)
+            else:
+                setup, run = bench_draw_cold(size, game)
+
+            latencies = measure(setup, run, min_time, max_iterations)
+            record = summarize(case, size, latencies, peak_memory(setup, run))
+            results.append(record)
+            print(
+                f"{case:>10} {size:>5}  {record['ops_per_sec']:>10.1f} ops/s  "
+                f"p50 {record['p50_ms']:>9.3f} ms  p99 {record['p99_ms']:>9.3f} ms  "
+                f"peak {record['peak_memory_bytes'] / 1e6:>8.2f} MB"
+            )
+    return results
+
+
+def compare(old_path, new_path):
+    """Print the change in ops/sec and latency between two result files"""
+    with open(old_path) as old_file:
+        old = {(r["case"], r["size"]): r for r in json.load(old_file)["results"]}
+    with open(new_path) as new_file:
+        new = {(r["case"], r["size"]): r for r in json.load(new_file)["results"]}
+
+    print(f"{'case':>10} {'size':>5}  {'old ops/s':>10} {'new ops/s':>10} {'speedup':>8}  {'p99 old':>9} {'p99 new':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        speedup = after["ops_per_sec"] / before["ops_per_sec"] if before["ops_per_sec"] else float("inf")
+        print(
+            f"{key[0]:>10} {key[1]:>5}  {before['ops_per_sec']:>10.1f} {after['ops_per_sec']:>10.1f} "
+            f"{speedup:>7.2f}x  {before['p99_ms']:>9.3f} {after['p99_ms']:>9.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MindMaze benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="board sizes to run")
+    parser.add_argument("--cases", nargs="+", default=["generate", "ai_turn", "repair", "draw", "draw_cold"],
+                        choices=["generate", "ai_turn", "repair", "draw", "draw_cold"], help="cases to run")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to spend per case")
+    parser.add_argument("--max-iterations", type=int, default=1000, help="iteration cap per case")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for board generation")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the JSON results")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run_benchmarks(args.sizes, args.cases, args.min_time, args.max_iterations, args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
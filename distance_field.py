@@ -0,0 +1,218 @@
+import heapq
+from array import array
+from collections import deque
+
+import numpy as np
+
+# Distance of cells that cannot reach the goal
+UNREACHABLE = -1
+
+
+class DistanceField:
+    """Cached BFS distance from every open cell to the goal
+
+    The field keeps its own copy of which cells are open, so callers can try out
+    flips on it and undo them. Each single-cell flip is repaired incrementally:
+    opening a cell pushes shorter distances outwards, and closing a cell
+    recomputes only the cells whose shortest route ran through it. Reading a
+    distance is an O(1) lookup.
+
+    Internally the grid is flattened with a one-cell closed border, so the inner
+    loops step to neighbours with +-1 / +-stride and never need bounds checks.
+    """
+
+    def __init__(self, maze, goal):
+        self.height, self.width = maze.shape
+        self.goal = tuple(goal)
+        self.stride = self.width + 2
+        self.offsets = (1, -1, self.stride, -self.stride)
+
+        size = self.stride * (self.height + 2)
+        self.open_cells = bytearray(size)
+        self.dist_cells = array('i', [UNREACHABLE]) * size
+
+        # NumPy views over the same memory, without the border
+        padded_open = np.frombuffer(self.open_cells, dtype=np.uint8).reshape(self.height + 2, self.stride)
+        padded_dist = np.frombuffer(self.dist_cells, dtype=np.int32).reshape(self.height + 2, self.stride)
+        self.open = padded_open[1:-1, 1:-1]
+        self.dist = padded_dist[1:-1, 1:-1]
+
+        self.open[...] = maze == 1
+        self.rebuild()
+
+    def _index(self, x, y):
+        """Flat index of (x, y) in the padded grid"""
+        return (y + 1) * self.stride + x + 1
+
+    def _position(self, index):
+        """(x, y) of a flat padded index"""
+        y, x = divmod(index, self.stride)
+        return (x - 1, y - 1)
+
+    def rebuild(self):
+        """Recompute the whole field with a BFS from the goal"""
+        self.dist.fill(UNREACHABLE)
+        goal = self._index(*self.goal)
+        if not self.open_cells[goal]:
+            return
+
+        open_cells = self.open_cells
+        dist = self.dist_cells
+        offsets = self.offsets
+        dist[goal] = 0
+        queue = deque([goal])
+        while queue:
+            cell = queue.popleft()
+            next_dist = dist[cell] + 1
+            for offset in offsets:
+                neighbor = cell + offset
+                if open_cells[neighbor] and dist[neighbor] == UNREACHABLE:
+                    dist[neighbor] = next_dist
+                    queue.append(neighbor)
+
+    def distance(self, x, y):
+        """Get the shortest path length from (x, y) to the goal, or UNREACHABLE"""
+        return self.dist_cells[(y + 1) * self.stride + x + 1]
+
+    def set_cell(self, x, y, value):
+        """Flip one cell to path (1) or wall (0) and repair the field around it"""
+        cell = self._index(x, y)
+        is_open = 1 if value == 1 else 0
+        if self.open_cells[cell] == is_open:
+            return
+
+        self.open_cells[cell] = is_open
+        if is_open:
+            self._open_cell(cell)
+        else:
+            self._close_cell(cell)
+
+    def route_from(self, x, y):
+        """Get one shortest route from (x, y) down to the goal, or [] if unreachable
+
+        Walks downhill through the field, so it costs O(route length).
+        """
+        dist = self.dist_cells
+        open_cells = self.open_cells
+        cell = self._index(x, y)
+        if dist[cell] == UNREACHABLE:
+            return []
+
+        route = [(x, y)]
+        while dist[cell] > 0:
+            target = dist[cell] - 1
+            for offset in self.offsets:
+                neighbor = cell + offset
+                if open_cells[neighbor] and dist[neighbor] == target:
+                    cell = neighbor
+                    break
+            route.append(self._position(cell))
+        return route
+
+    def _open_cell(self, cell):
+        """A wall became a path: take the best neighbour distance and push improvements out"""
+        open_cells = self.open_cells
+        dist = self.dist_cells
+        offsets = self.offsets
+
+        if cell == self._index(*self.goal):
+            best = 0
+        else:
+            best = UNREACHABLE
+            for offset in offsets:
+                neighbor = cell + offset
+                neighbor_dist = dist[neighbor]
+                if open_cells[neighbor] and neighbor_dist != UNREACHABLE:
+                    if best == UNREACHABLE or neighbor_dist + 1 < best:
+                        best = neighbor_dist + 1
+            if best == UNREACHABLE:
+                return
+        dist[cell] = best
+
+        queue = deque([cell])
+        while queue:
+            current = queue.popleft()
+            next_dist = dist[current] + 1
+            for offset in offsets:
+                neighbor = current + offset
+                if open_cells[neighbor]:
+                    neighbor_dist = dist[neighbor]
+                    if neighbor_dist == UNREACHABLE or neighbor_dist > next_dist:
+                        dist[neighbor] = next_dist
+                        queue.append(neighbor)
+
+    def _close_cell(self, cell):
+        """A path became a wall: recompute the cells that depended on it"""
+        open_cells = self.open_cells
+        dist = self.dist_cells
+        offsets = self.offsets
+
+        removed_dist = dist[cell]
+        dist[cell] = UNREACHABLE
+        if removed_dist == UNREACHABLE:
+            return
+
+        # Find the cells that lost every neighbour one step closer to the goal.
+        # Candidates are visited level by level, so when a cell is checked every
+        # cell one level below it already has its final status.
+        affected = set()
+        checked = set()
+        queue = deque(
+            cell + offset for offset in offsets
+            if open_cells[cell + offset] and dist[cell + offset] == removed_dist + 1
+        )
+        while queue:
+            current = queue.popleft()
+            if current in checked:
+                continue
+            checked.add(current)
+            level = dist[current]
+
+            supported = False
+            for offset in offsets:
+                neighbor = current + offset
+                if open_cells[neighbor] and dist[neighbor] == level - 1 and neighbor not in affected:
+                    supported = True
+                    break
+            if supported:
+                continue
+
+            affected.add(current)
+            for offset in offsets:
+                neighbor = current + offset
+                if open_cells[neighbor] and dist[neighbor] == level + 1:
+                    queue.append(neighbor)
+
+        if not affected:
+            return
+
+        for current in affected:
+            dist[current] = UNREACHABLE
+
+        # Seed the affected region from its unaffected border, then settle it
+        # in distance order
+        heap = []
+        for current in affected:
+            best = UNREACHABLE
+            for offset in offsets:
+                neighbor = current + offset
+                neighbor_dist = dist[neighbor]
+                if open_cells[neighbor] and neighbor_dist != UNREACHABLE:
+                    if best == UNREACHABLE or neighbor_dist + 1 < best:
+                        best = neighbor_dist + 1
+            if best != UNREACHABLE:
+                heap.append((best, current))
+        heapq.heapify(heap)
+
+        while heap:
+            current_dist, current = heapq.heappop(heap)
+            settled = dist[current]
+            if settled != UNREACHABLE and settled <= current_dist:
+                continue
+            dist[current] = current_dist
+            for offset in offsets:
+                neighbor = current + offset
+                if neighbor in affected:
+                    neighbor_dist = dist[neighbor]
+                    if neighbor_dist == UNREACHABLE or neighbor_dist > current_dist + 1:
+                        heapq.heappush(heap, (current_dist + 1, neighbor))
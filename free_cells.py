@@ -0,0 +1,83 @@
+import random
+from array import array
+
+import numpy as np
+
+
+class NoFreeCellsError(IndexError):
+    """Raised when there are fewer free cells left than were asked for"""
+
+
+class FreeCellIndex:
+    """The set of free cells of a board, with O(1) add, remove and random sampling
+
+    Cells are kept as flat ids (y * width + x) in a dense array, and a slot map
+    gives each cell's index in that array (-1 if absent). Removing a cell moves
+    the last id into its slot, so the dense array never has holes and a uniform
+    sample is a single random index.
+    """
+
+    def __init__(self, mask, rng=None):
+        self.height, self.width = mask.shape
+        self.rng = rng if rng is not None else random
+
+        ids = np.flatnonzero(mask).astype(np.int32)
+        slots = np.full(mask.size, -1, dtype=np.int32)
+        slots[ids] = np.arange(len(ids), dtype=np.int32)
+        self.cells = array('i', ids.tobytes())
+        self.slots = array('i', slots.tobytes())
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, pos):
+        x, y = pos
+        return self.slots[y * self.width + x] != -1
+
+    def add(self, x, y):
+        """Mark (x, y) as free"""
+        cell = y * self.width + x
+        if self.slots[cell] == -1:
+            self.slots[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, x, y):
+        """Mark (x, y) as taken, if it was free"""
+        cell = y * self.width + x
+        slot = self.slots[cell]
+        if slot == -1:
+            return
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[slot] = last
+            self.slots[last] = slot
+        self.slots[cell] = -1
+
+    def sample(self):
+        """Get one uniformly random free cell as (x, y)"""
+        if not self.cells:
+            raise NoFreeCellsError("no free cells left on the board")
+        y, x = divmod(self.cells[self.rng.randrange(len(self.cells))], self.width)
+        return x, y
+
+    def sample_distinct(self, k):
+        """Get k distinct uniformly random free cells as a list of (x, y)
+
+        Runs a partial Fisher-Yates shuffle over the dense array, so it costs O(k).
+        The cells stay free; callers discard the ones they take.
+        """
+        cells = self.cells
+        slots = self.slots
+        n = len(cells)
+        if k > n:
+            raise NoFreeCellsError(f"asked for {k} free cells but only {n} are left")
+
+        # Swap each pick to the end of the array, shrinking the pool as we go
+        for i in range(k):
+            end = n - 1 - i
+            j = self.rng.randrange(end + 1)
+            cells[j], cells[end] = cells[end], cells[j]
+            slots[cells[j]] = j
+            slots[cells[end]] = end
+
+        return [(cell % self.width, cell // self.width) for cell in cells[n - k:]]
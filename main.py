@@ -1,14 +1,59 @@
 import pygame
+import argparse
+import os
 import sys
-import numpy as np
-import random
-from maze_generator import MazeGenerator
-from ai_controller import AIController
-from player import Player
-from ui_elements import Button, MenuSystem, Legend
+from ai_planner import AIPlanner
+from maze_renderer import MazeRenderer
+from profiling import FrameProfiler
+from replay import ReplayRecorder
+from q_table import PersistentQTable
+from simulation import MazeSimulation, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT
+from ui_elements import Button, MenuSystem, Legend, get_font, render_text
+from viewport import Viewport
+
+# Where the AI's learned Q-table is kept between games and restarts
+DEFAULT_Q_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "q_table")
+
+# Arrow keys -> simulation actions
+KEY_ACTIONS = {
+    pygame.K_UP: MOVE_UP,
+    pygame.K_DOWN: MOVE_DOWN,
+    pygame.K_LEFT: MOVE_LEFT,
+    pygame.K_RIGHT: MOVE_RIGHT,
+}
+
+# Zoom keys -> cell size factor
+ZOOM_KEYS = {
+    pygame.K_EQUALS: 1.25,
+    pygame.K_PLUS: 1.25,
+    pygame.K_KP_PLUS: 1.25,
+    pygame.K_MINUS: 0.8,
+    pygame.K_KP_MINUS: 0.8,
+}
+
+# Posted from the planner thread when an AI plan is ready, to wake the main loop
+AI_PLAN_READY = pygame.event.custom_type()
+
+# Toggles the phase timing overlay
+PROFILER_KEY = pygame.K_F3
+
+# Phases shown in the timing overlay, in display order
+PROFILED_PHASES = (
+    "handle_events",
+    "draw",
+    "ai_modify_maze",
+    "get_maze_modifications",
+    "apply_ai_modifications",
+    "ensure_path_to_goal",
+)
+
+# How long a hint stays on screen
+HINT_DURATION_MS = 5000
 
 class MindMazeGame:
-    def __init__(self):
+    def __init__(self, q_table_path=DEFAULT_Q_TABLE_PATH, maze_width=15, maze_height=15,
+                 max_fps=60, idle_timeout_ms=1000, background_ai=True, speculative_ai=True,
+                 profile=False, profile_log=None, record_path=None, live_hints=False):
         # Initialize pygame
         pygame.init()
         pygame.font.init()
@@ -17,10 +62,8 @@ class MindMazeGame:
         self.SCREEN_WIDTH = 800
         self.SCREEN_HEIGHT = 600
         self.CELL_SIZE = 40
-        self.MAZE_WIDTH = 15
-        self.MAZE_HEIGHT = 15
-        self.MAZE_OFFSET_X = (self.SCREEN_WIDTH - self.MAZE_WIDTH * self.CELL_SIZE) // 2
-        self.MAZE_OFFSET_Y = (self.SCREEN_HEIGHT - self.MAZE_HEIGHT * self.CELL_SIZE) // 2
+        self.MAZE_WIDTH = maze_width
+        self.MAZE_HEIGHT = maze_height
         
         # Colors
         self.BLACK = (0, 0, 0)
@@ -35,17 +78,84 @@ class MindMazeGame:
         self.screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
         pygame.display.set_caption("MindMaze: AI-Powered Labyrinth")
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont('Arial', 20)
         
-        # Game components
-        self.maze_generator = MazeGenerator(self.MAZE_WIDTH, self.MAZE_HEIGHT)
-        self.ai_controller = AIController(self.MAZE_WIDTH, self.MAZE_HEIGHT)
+        # Frame scheduling: frames are drawn only when something changed, at most
+        # max_fps a second, and an idle loop sleeps in event.wait for up to
+        # idle_timeout_ms at a time
+        self.max_fps = max_fps
+        self.idle_timeout_ms = idle_timeout_ms
+        self.needs_redraw = True
+        self.font = get_font('Arial', 20)
+        
+        # One warm Q-table shared by every game (None keeps learning in memory only)
+        self.q_table = None
+        if q_table_path is not None:
+            self.q_table = PersistentQTable(
+                q_table_path, self.MAZE_WIDTH * self.MAZE_HEIGHT * 2, self.MAZE_WIDTH, self.MAZE_HEIGHT
+            )
+        
+        # Phase timers: on from the start with profile/profile_log, otherwise only
+        # while the overlay is shown
+        self.profile_requested = profile or profile_log is not None
+        self.profiler = FrameProfiler(enabled=self.profile_requested, export_path=profile_log)
+        self.show_profiler = False
+        self.profiler_rect = pygame.Rect(10, 80, 360, 30 + 20 * len(PROFILED_PHASES))
+        
+        # Optional replay log of every game played in this session
+        self.recorder = ReplayRecorder(record_path) if record_path is not None else None
+        
+        # Game rules run in the display-free simulation (AI modifies maze every 3 turns)
+        self.sim = MazeSimulation(
+            self.MAZE_WIDTH, self.MAZE_HEIGHT, ai_modify_frequency=3, q_table=self.q_table, profiler=self.profiler,
+            recorder=self.recorder
+        )
+        self.sim_is_fresh = True
+        
+        # Plan AI turns on a worker thread so they never stall input or drawing
+        self.planner = None
+        if background_ai:
+            self.planner = AIPlanner(
+                self.sim, speculative=speculative_ai,
+                on_ready=lambda: pygame.event.post(pygame.event.Event(AI_PLAN_READY))
+            )
         
         # Game state variables
         self.game_state = "menu"  # "menu", "playing", "game_over"
-        self.turn_count = 0
-        self.ai_modify_frequency = 3  # AI modifies maze every 3 turns
         self.hints_remaining = 3
+        self.current_hint = None
+        self.hint_display_time = 0
+        
+        # Live hints keep the AI's prediction on screen, refreshed after every move
+        # and AI turn, instead of rationing it to the hint button
+        self.live_hints = live_hints
+        self.hint_stale = live_hints
+        self.hint_future = None  # Prediction running on the planner thread
+        
+        # Screen areas of the UI that change during play
+        self.status_rect = pygame.Rect(10, 10, 150, 55)  # Turn and hint counters
+        self.hint_button_rect = pygame.Rect(10, self.SCREEN_HEIGHT - 40, 100, 30)
+        
+        # Camera over the board: centres boards that fit, scrolls and zooms larger ones
+        self.viewport = Viewport(
+            (0, 0, self.SCREEN_WIDTH, self.SCREEN_HEIGHT), self.MAZE_WIDTH, self.MAZE_HEIGHT, self.CELL_SIZE
+        )
+        
+        # Pre-rendered maze chunks, patched only where the simulation changed them
+        self.maze_renderer = MazeRenderer(self.MAZE_WIDTH, self.MAZE_HEIGHT, self.CELL_SIZE, {
+            "path": self.WHITE,
+            "wall": self.BLACK,
+            "border": self.BLACK,
+            "goal": self.GREEN,
+            "trap": self.RED,
+            "teleporter": self.BLUE,
+            "shortcut": self.YELLOW,
+        })
+        
+        # What the screen currently shows, to work out which rects are stale
+        self.full_redraw = True
+        self.drawn_player_pos = None
+        self.drawn_ui_state = None
+        self.drawn_hint = None  # display time of the hint on screen, if any
         
         # Menu system
         self.menu = MenuSystem(self.SCREEN_WIDTH, self.SCREEN_HEIGHT)
@@ -53,95 +163,125 @@ class MindMazeGame:
         # Legend for color meanings
         self.legend = Legend(self.SCREEN_WIDTH, 10, self.CELL_SIZE)
         
+        # Translucent overlays, built on first use
+        self.hint_surface = None
+        self.dim_surface = None
+        
         # Initialize the game
         self.initialize_game()
 
     def initialize_game(self):
-        # Generate initial maze
-        self.maze = self.maze_generator.generate()
-        
-        # Set start position (top-left) and goal position (center)
-        self.start_pos = (0, 0)
-        self.goal_pos = (self.MAZE_WIDTH // 2, self.MAZE_HEIGHT // 2)
-        
-        # Create player and place at start position
-        self.player = Player(self.start_pos[0], self.start_pos[1])
-        
-        # Reset turn count and hints
-        self.turn_count = 0
+        # Persist what the AI learned so far, then start a fresh maze. The
+        # simulation already set up its first game when it was built.
+        self.save_q_table()
+        if self.sim_is_fresh:
+            self.sim_is_fresh = False
+        else:
+            self.sim.reset()
+        if self.planner is not None:
+            self.planner.start()
+        
+        # New board: drop the old chunks, find the player and repaint the whole screen
+        self.sim.pop_changed_cells()
+        self.maze_renderer.clear()
+        self.viewport.follow(*self.sim.player.get_position())
+        self.full_redraw = True
+        self.needs_redraw = True
+        
+        # Reset hints
         self.hints_remaining = 3
+        self.current_hint = None
+        self.hint_future = None
+        self.hint_stale = self.live_hints
+
+    def save_q_table(self):
+        # The planner thread must be idle, since it writes to the Q-table
+        if self.planner is not None:
+            self.planner.cancel()
+        if self.q_table is not None:
+            self.q_table.flush()
+
+    def quit(self):
+        # Save what the AI learned before leaving
+        self.save_q_table()
+        if self.planner is not None:
+            self.planner.shutdown()
+        self.profiler.close()
+        if self.recorder is not None:
+            self.recorder.close(self.sim)
+        pygame.quit()
+        sys.exit()
+
+    def update(self):
+        # Apply a finished AI plan between frames, so a frame never shows half of one
+        if self.planner is not None and self.game_state == "playing":
+            if self.planner.update():
+                self.needs_redraw = True
+                self.hint_stale = self.live_hints
+        
+        if self.live_hints and self.game_state == "playing":
+            self.update_live_hint()
+
+    def update_live_hint(self):
+        # Pick up a finished prediction, then start a new one if the board moved on
+        if self.hint_future is not None:
+            if not self.hint_future.done():
+                return
+            self.show_hint(self.hint_future.result())
+            self.hint_future = None
+        
+        if not self.hint_stale:
+            return
+        self.hint_stale = False
+        if self.planner is not None:
+            self.hint_future = self.planner.predict()
+        else:
+            self.show_hint(self.sim.ai_controller.get_modification_prediction())
+
+    def show_hint(self, predictions):
+        # A new display time repaints the hint box, so only bump it on a change
+        if predictions != self.current_hint:
+            self.current_hint = predictions
+            self.hint_display_time = pygame.time.get_ticks()
+            self.needs_redraw = True
+
+    def handle_events(self, events=None):
+        if events is None:
+            events = pygame.event.get()
         
-        # Special tiles
-        self.traps = []
-        self.teleporters = []
-        self.shortcuts = []
-        
-        # Place initial traps and teleporters
-        self.place_special_tiles()
-        
-        # Initialize AI with the maze
-        self.ai_controller = AIController(self.MAZE_WIDTH, self.MAZE_HEIGHT)
-        self.ai_controller.set_maze(self.maze)
-        self.ai_controller.set_player_position(self.player.x, self.player.y)
-
-    def place_special_tiles(self):
-        # Clear existing special tiles
-        self.traps = []
-        self.teleporters = []
-        self.shortcuts = []
-        
-        # Place traps (3 traps)
-        for _ in range(3):
-            x, y = self.get_random_valid_position()
-            self.traps.append((x, y))
-        
-        # Place teleporters (2 pairs)
-        for _ in range(2):
-            x1, y1 = self.get_random_valid_position()
-            x2, y2 = self.get_random_valid_position()
-            self.teleporters.append(((x1, y1), (x2, y2)))
-        
-        # Place shortcuts (2)
-        for _ in range(2):
-            x, y = self.get_random_valid_position()
-            self.shortcuts.append((x, y))
-
-    def get_random_valid_position(self):
-        while True:
-            x = random.randint(0, self.MAZE_WIDTH - 1)
-            y = random.randint(0, self.MAZE_HEIGHT - 1)
+        for event in events:
+            # Any input may change what is on screen
+            self.needs_redraw = True
             
-            # Check if position is not start, goal, or another special tile
-            if ((x, y) != self.start_pos and 
-                (x, y) != self.goal_pos and 
-                (x, y) not in self.traps and
-                not any((x, y) in pair for pair in self.teleporters) and
-                (x, y) not in self.shortcuts and
-                (x, y) != (self.player.x, self.player.y)):
-                return x, y
-
-    def handle_events(self):
-        for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                self.quit()
+            
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # The window contents were lost, so dirty rects are not enough
+                self.full_redraw = True
+            
+            if event.type == pygame.KEYDOWN and event.key == PROFILER_KEY:
+                self.toggle_profiler()
+                continue
             
             if self.game_state == "menu":
                 action = self.menu.handle_event(event)
                 if action == "start_game":
                     self.game_state = "playing"
                 elif action == "quit":
-                    pygame.quit()
-                    sys.exit()
+                    self.quit()
             
             elif self.game_state == "playing":
                 if event.type == pygame.KEYDOWN:
-                    self.handle_player_movement(event.key)
+                    if event.key in ZOOM_KEYS:
+                        self.zoom(ZOOM_KEYS[event.key])
+                    else:
+                        self.handle_player_movement(event.key)
                 
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     # Use hint if clicked on hint button
-                    hint_rect = pygame.Rect(10, self.SCREEN_HEIGHT - 40, 100, 30)
-                    if hint_rect.collidepoint(event.pos) and self.hints_remaining > 0:
+                    if (self.hint_button_rect.collidepoint(event.pos) and self.hints_remaining > 0
+                            and not self.live_hints):
                         self.use_hint()
             
             elif self.game_state == "game_over":
@@ -151,336 +291,345 @@ class MindMazeGame:
                     self.game_state = "menu"
 
     def handle_player_movement(self, key):
-        # Store previous position
-        prev_x, prev_y = self.player.x, self.player.y
-        
-        # Handle movement keys
-        if key == pygame.K_UP and self.can_move(self.player.x, self.player.y - 1):
-            self.player.move(0, -1)
-        elif key == pygame.K_DOWN and self.can_move(self.player.x, self.player.y + 1):
-            self.player.move(0, 1)
-        elif key == pygame.K_LEFT and self.can_move(self.player.x - 1, self.player.y):
-            self.player.move(-1, 0)
-        elif key == pygame.K_RIGHT and self.can_move(self.player.x + 1, self.player.y):
-            self.player.move(1, 0)
-        
-        # Check if player actually moved
-        if (prev_x, prev_y) != (self.player.x, self.player.y):
-            self.turn_count += 1
-            
-            # Check for teleporter
-            self.check_teleporter()
-            
-            # Check for trap
-            if self.check_trap():
-                # Player hit trap, move back
-                self.player.x, self.player.y = prev_x, prev_y
-            
-            # Check for shortcut
-            self.check_shortcut()
-            
-            # Check for goal
-            if (self.player.x, self.player.y) == self.goal_pos:
-                self.game_state = "game_over"
-            
-            # Update AI with new player position
-            self.ai_controller.set_player_position(self.player.x, self.player.y)
-            
-            # AI modifies maze every few turns
-            if self.turn_count % self.ai_modify_frequency == 0:
-                self.ai_modify_maze()
-
-    def can_move(self, x, y):
-        # Check if position is within maze bounds
-        if x < 0 or x >= self.MAZE_WIDTH or y < 0 or y >= self.MAZE_HEIGHT:
-            return False
+        action = KEY_ACTIONS.get(key)
+        if action is None:
+            return
         
-        # Check if there's a path in the maze
-        return self.maze[y][x] == 1  # 1 represents a path
-
-    def check_teleporter(self):
-        for teleporter_pair in self.teleporters:
-            if (self.player.x, self.player.y) == teleporter_pair[0]:
-                self.player.x, self.player.y = teleporter_pair[1]
-                break
-            elif (self.player.x, self.player.y) == teleporter_pair[1]:
-                self.player.x, self.player.y = teleporter_pair[0]
-                break
-
-    def check_trap(self):
-        return (self.player.x, self.player.y) in self.traps
-
-    def check_shortcut(self):
-        if (self.player.x, self.player.y) in self.shortcuts:
-            # Move player closer to goal
-            goal_x, goal_y = self.goal_pos
-            dx = goal_x - self.player.x
-            dy = goal_y - self.player.y
-            
-            # Move in the direction of the goal by up to 3 cells
-            steps = min(3, abs(dx) + abs(dy))
+        result = self.sim.step(action)
+        if result.moved:
+            self.hint_stale = self.live_hints
+        
+        # Check for goal
+        if result.won:
+            self.game_state = "game_over"
             
-            for _ in range(steps):
-                # Determine direction with highest priority
-                if abs(dx) > abs(dy):
-                    # Move horizontally
-                    step_x = 1 if dx > 0 else -1
-                    if self.can_move(self.player.x + step_x, self.player.y):
-                        self.player.x += step_x
-                        dx -= step_x
-                    else:
-                        # Try vertical if horizontal is blocked
-                        step_y = 1 if dy > 0 else -1
-                        if self.can_move(self.player.x, self.player.y + step_y):
-                            self.player.y += step_y
-                            dy -= step_y
-                        else:
-                            break  # If both directions are blocked, stop moving
-                else:
-                    # Move vertically
-                    step_y = 1 if dy > 0 else -1
-                    if self.can_move(self.player.x, self.player.y + step_y):
-                        self.player.y += step_y
-                        dy -= step_y
-                    else:
-                        # Try horizontal if vertical is blocked
-                        step_x = 1 if dx > 0 else -1
-                        if self.can_move(self.player.x + step_x, self.player.y):
-                            self.player.x += step_x
-                            dx -= step_x
-                        else:
-                            break
+            # End of a game is a safe point to persist the AI
+            self.save_q_table()
+
+    def toggle_profiler(self):
+        # Timers run while the overlay is up, or all the time if asked for at startup
+        self.show_profiler = not self.show_profiler
+        self.profiler.enabled = self.show_profiler or self.profile_requested
+        self.full_redraw = True
+
+    def zoom(self, factor):
+        # Zoom around the player; chunks at the old cell size are useless now
+        if self.viewport.zoom(factor, self.sim.player.get_position()):
+            self.maze_renderer.set_cell_size(self.viewport.cell_size)
+            self.full_redraw = True
 
     def ai_modify_maze(self):
-        # Let AI modify the maze
-        modifications = self.ai_controller.get_maze_modifications()
-        
-        # Apply modifications
-        for x, y, value in modifications:
-            if 0 <= x < self.MAZE_WIDTH and 0 <= y < self.MAZE_HEIGHT:
-                # Don't modify start, goal, or player position
-                if ((x, y) != self.start_pos and 
-                    (x, y) != self.goal_pos and 
-                    (x, y) != (self.player.x, self.player.y)):
-                    self.maze[y][x] = value
-        
-        # Ensure there's always a path to the goal
-        self.ensure_path_to_goal()
-        
-        # Update special tiles
-        self.update_special_tiles()
+        # Run an AI turn right now; the planner's controller must be idle for that
+        if self.planner is not None:
+            self.planner.cancel()
+        self.sim.ai_modify_maze()
 
     def ensure_path_to_goal(self):
-        # This is a simplified version - in a real implementation,
-        # you'd want to use a pathfinding algorithm to ensure
-        # there's a valid path from player to goal
-        # For now, we'll just make sure all cells have at least one neighbor
-        for y in range(self.MAZE_HEIGHT):
-            for x in range(self.MAZE_WIDTH):
-                if self.maze[y][x] == 1:  # If it's a path
-                    # Count accessible neighbors
-                    neighbors = 0
-                    for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                        nx, ny = x + dx, y + dy
-                        if (0 <= nx < self.MAZE_WIDTH and 
-                            0 <= ny < self.MAZE_HEIGHT and 
-                            self.maze[ny][nx] == 1):
-                            neighbors += 1
-                    
-                    # If isolated, connect to a neighbor
-                    if neighbors == 0:
-                        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                            nx, ny = x + dx, y + dy
-                            if (0 <= nx < self.MAZE_WIDTH and 
-                                0 <= ny < self.MAZE_HEIGHT):
-                                self.maze[ny][nx] = 1
-                                break
-
-    def update_special_tiles(self):
-        # Occasionally move traps based on player position
-        if random.random() < 0.3:  # 30% chance to move traps
-            for i in range(len(self.traps)):
-                if random.random() < 0.5:  # 50% chance for each trap
-                    self.traps[i] = self.get_random_valid_position()
-        
-        # Occasionally move teleporters
-        if random.random() < 0.2:  # 20% chance to move teleporters
-            for i in range(len(self.teleporters)):
-                if random.random() < 0.3:  # 30% chance for each teleporter pair
-                    self.teleporters[i] = (
-                        self.get_random_valid_position(),
-                        self.get_random_valid_position()
-                    )
-        
-        # Occasionally move shortcuts
-        if random.random() < 0.25:  # 25% chance to move shortcuts
-            for i in range(len(self.shortcuts)):
-                if random.random() < 0.4:  # 40% chance for each shortcut
-                    self.shortcuts[i] = self.get_random_valid_position()
+        self.sim.ensure_path_to_goal()
 
     def use_hint(self):
         if self.hints_remaining > 0:
             self.hints_remaining -= 1
             # Get AI predictions for next maze modification
-            predictions = self.ai_controller.get_modification_prediction()
+            if self.planner is not None:
+                predictions = self.planner.call(self.sim.ai_controller.get_modification_prediction)
+            else:
+                predictions = self.sim.ai_controller.get_modification_prediction()
             # Store predictions for display
             self.current_hint = predictions
             self.hint_display_time = pygame.time.get_ticks()
 
     def draw(self):
+        if self.game_state == "playing":
+            self.draw_playing()
+            return
+        
         self.screen.fill(self.BLACK)
         
         if self.game_state == "menu":
             self.menu.draw(self.screen)
             
             # Draw the legend on the menu screen too
-            self.legend.draw(self.screen, [
-                ("White", self.WHITE, "Path"),
-                ("Black", self.BLACK, "Wall"),
-                ("Green", self.GREEN, "Goal"),
-                ("Red", self.RED, "Trap"),
-                ("Blue", self.BLUE, "Teleporter"),
-                ("Yellow", self.YELLOW, "Shortcut"),
-                ("Purple", self.PURPLE, "Player")
-            ])
-        
-        elif self.game_state == "playing":
-            self.draw_maze()
-            self.draw_player()
-            self.draw_ui()
-            
-            # Draw legend during gameplay
-            self.legend.draw(self.screen, [
-                ("White", self.WHITE, "Path"),
-                ("Black", self.BLACK, "Wall"),
-                ("Green", self.GREEN, "Goal"),
-                ("Red", self.RED, "Trap"),
-                ("Blue", self.BLUE, "Teleporter"),
-                ("Yellow", self.YELLOW, "Shortcut"),
-                ("Purple", self.PURPLE, "Player")
-            ])
-            
-            # Draw hint if active
-            if hasattr(self, 'current_hint') and hasattr(self, 'hint_display_time'):
-                if pygame.time.get_ticks() - self.hint_display_time < 5000:  # Display hint for 5 seconds
-                    self.draw_hint()
+            self.draw_legend()
         
         elif self.game_state == "game_over":
             self.draw_game_over()
         
+        if self.show_profiler:
+            self.draw_profiler()
+        
         pygame.display.flip()
+        
+        # The play field has to be repainted in full when we get back to it
+        self.full_redraw = True
+
+    def draw_playing(self):
+        """Repaint only the parts of the play field that changed since the last frame"""
+        dirty = []
+        
+        # Scroll if the player got close to the edge of the screen
+        player_pos = self.sim.player.get_position()
+        if self.viewport.follow(*player_pos):
+            self.full_redraw = True
+        
+        # Bring the cached maze up to date with the cells the simulation changed
+        changed = self.sim.pop_changed_cells()
+        self.maze_renderer.render_cells(self.sim, changed)
+        for x, y in changed:
+            rect = self.cell_screen_rect(x, y)
+            if rect.colliderect(self.viewport.rect):
+                dirty.append(rect)
+        
+        # The player's old and new cells
+        if player_pos != self.drawn_player_pos:
+            if self.drawn_player_pos is not None:
+                dirty.append(self.cell_screen_rect(*self.drawn_player_pos))
+            dirty.append(self.cell_screen_rect(*player_pos))
+            self.drawn_player_pos = player_pos
+        
+        # Turn and hint counters
+        ui_state = (self.sim.turn_count, self.hints_remaining)
+        if ui_state != self.drawn_ui_state:
+            dirty.append(self.status_rect)
+            dirty.append(self.hint_button_rect)
+            self.drawn_ui_state = ui_state
+        
+        # The timing overlay changes whenever a frame is drawn
+        if self.show_profiler and dirty:
+            dirty.append(self.profiler_rect)
+        
+        # The hint box covers a large area, so showing, replacing or hiding it
+        # repaints everything
+        hint = self.hint_display_time if self.is_hint_visible() else None
+        if hint != self.drawn_hint:
+            self.drawn_hint = hint
+            self.full_redraw = True
+        
+        if self.full_redraw:
+            self.compose_playing()
+            pygame.display.flip()
+            self.full_redraw = False
+            return
+        
+        if not dirty:
+            return
+        
+        # Recompose everything inside the changed area, then push just the changed rects
+        self.screen.set_clip(dirty[0].unionall(dirty[1:]))
+        self.compose_playing()
+        self.screen.set_clip(None)
+        pygame.display.update(dirty)
+
+    def compose_playing(self):
+        """Draw every layer of the play field, in order, inside the current clip"""
+        self.screen.fill(self.BLACK)
+        self.draw_maze()
+        self.draw_player()
+        self.draw_ui()
+        
+        # Draw legend during gameplay
+        self.draw_legend()
+        
+        # Draw hint if active
+        if self.drawn_hint is not None:
+            self.draw_hint()
+        
+        # Phase timings on top of everything
+        if self.show_profiler:
+            self.draw_profiler()
+
+    def draw_legend(self):
+        self.legend.draw(self.screen, [
+            ("White", self.WHITE, "Path"),
+            ("Black", self.BLACK, "Wall"),
+            ("Green", self.GREEN, "Goal"),
+            ("Red", self.RED, "Trap"),
+            ("Blue", self.BLUE, "Teleporter"),
+            ("Yellow", self.YELLOW, "Shortcut"),
+            ("Purple", self.PURPLE, "Player")
+        ])
+
+    def is_hint_visible(self):
+        # Display hint for HINT_DURATION_MS (live hints stay up)
+        if self.current_hint is None:
+            return False
+        return self.live_hints or pygame.time.get_ticks() - self.hint_display_time < HINT_DURATION_MS
+
+    def cell_screen_rect(self, x, y):
+        """Rect of maze cell (x, y) on the screen"""
+        return self.viewport.cell_rect(x, y)
 
     def draw_maze(self):
-        for y in range(self.MAZE_HEIGHT):
-            for x in range(self.MAZE_WIDTH):
-                rect = pygame.Rect(
-                    self.MAZE_OFFSET_X + x * self.CELL_SIZE,
-                    self.MAZE_OFFSET_Y + y * self.CELL_SIZE,
-                    self.CELL_SIZE,
-                    self.CELL_SIZE
-                )
-                
-                # Draw path or wall
-                color = self.WHITE if self.maze[y][x] == 1 else self.BLACK
-                pygame.draw.rect(self.screen, color, rect)
-                pygame.draw.rect(self.screen, self.BLACK, rect, 1)  # Border
-                
-                # Draw goal
-                if (x, y) == self.goal_pos:
-                    pygame.draw.rect(self.screen, self.GREEN, rect)
-                    pygame.draw.rect(self.screen, self.BLACK, rect, 1)
-                
-                # Draw special tiles
-                if (x, y) in self.traps:
-                    pygame.draw.rect(self.screen, self.RED, rect)
-                    pygame.draw.rect(self.screen, self.BLACK, rect, 1)
-                
-                for teleporter_pair in self.teleporters:
-                    if (x, y) in teleporter_pair:
-                        pygame.draw.rect(self.screen, self.BLUE, rect)
-                        pygame.draw.rect(self.screen, self.BLACK, rect, 1)
-                
-                if (x, y) in self.shortcuts:
-                    pygame.draw.rect(self.screen, self.YELLOW, rect)
-                    pygame.draw.rect(self.screen, self.BLACK, rect, 1)
+        # Cached chunks are kept current by draw_playing, so this only blits the visible ones
+        self.maze_renderer.draw(self.screen, self.sim, self.viewport)
 
     def draw_player(self):
+        player = self.sim.player
+        cell_size = self.viewport.cell_size
+        cell = self.viewport.cell_rect(player.x, player.y)
         rect = pygame.Rect(
-            self.MAZE_OFFSET_X + self.player.x * self.CELL_SIZE + self.CELL_SIZE // 4,
-            self.MAZE_OFFSET_Y + self.player.y * self.CELL_SIZE + self.CELL_SIZE // 4,
-            self.CELL_SIZE // 2,
-            self.CELL_SIZE // 2
+            cell.x + cell_size // 4,
+            cell.y + cell_size // 4,
+            cell_size // 2,
+            cell_size // 2
         )
         pygame.draw.rect(self.screen, self.PURPLE, rect)
 
     def draw_ui(self):
         # Draw turn counter
-        turn_text = self.font.render(f"Turn: {self.turn_count}", True, self.WHITE)
+        turn_text = render_text(self.font, f"Turn: {self.sim.turn_count}", self.WHITE)
         self.screen.blit(turn_text, (10, 10))
         
-        # Draw hints remaining
-        hint_text = self.font.render(f"Hints: {self.hints_remaining}", True, self.WHITE)
-        self.screen.blit(hint_text, (10, 40))
-        
-        # Draw hint button
-        hint_button = pygame.Rect(10, self.SCREEN_HEIGHT - 40, 100, 30)
-        pygame.draw.rect(self.screen, self.GREEN if self.hints_remaining > 0 else self.RED, hint_button)
-        button_text = self.font.render("Use Hint", True, self.BLACK)
-        self.screen.blit(button_text, (15, self.SCREEN_HEIGHT - 35))
+        # Draw hints remaining (live hints need no button)
+        if self.live_hints:
+            hint_text = render_text(self.font, "Hints: live", self.WHITE)
+            self.screen.blit(hint_text, (10, 40))
+        else:
+            hint_text = render_text(self.font, f"Hints: {self.hints_remaining}", self.WHITE)
+            self.screen.blit(hint_text, (10, 40))
+            
+            # Draw hint button
+            pygame.draw.rect(self.screen, self.GREEN if self.hints_remaining > 0 else self.RED, self.hint_button_rect)
+            button_text = render_text(self.font, "Use Hint", self.BLACK)
+            self.screen.blit(button_text, (15, self.SCREEN_HEIGHT - 35))
         
         # Draw controls info
-        controls_text = self.font.render("Use arrow keys to move", True, self.WHITE)
+        controls_text = render_text(self.font, "Use arrow keys to move", self.WHITE)
         self.screen.blit(controls_text, (self.SCREEN_WIDTH - 200, self.SCREEN_HEIGHT - 40))
 
     def draw_hint(self):
         # Draw hint information
-        hint_surface = pygame.Surface((300, 150))
-        hint_surface.fill((50, 50, 50))
-        hint_surface.set_alpha(200)
+        if self.hint_surface is None:
+            self.hint_surface = pygame.Surface((300, 150))
+            self.hint_surface.fill((50, 50, 50))
+            self.hint_surface.set_alpha(200)
         
-        self.screen.blit(hint_surface, (self.SCREEN_WIDTH - 310, 10))
+        self.screen.blit(self.hint_surface, (self.SCREEN_WIDTH - 310, 10))
         
-        title_text = self.font.render("AI Prediction:", True, self.WHITE)
+        title_text = render_text(self.font, "AI Prediction:", self.WHITE)
         self.screen.blit(title_text, (self.SCREEN_WIDTH - 300, 20))
         
         y_offset = 50
         for i, (x, y, value) in enumerate(self.current_hint[:3]):  # Show up to 3 predictions
             action = "Create path" if value == 1 else "Create wall"
-            pred_text = self.font.render(f"• ({x}, {y}): {action}", True, self.WHITE)
+            pred_text = render_text(self.font, f"• ({x}, {y}): {action}", self.WHITE)
             self.screen.blit(pred_text, (self.SCREEN_WIDTH - 300, y_offset))
             y_offset += 30
 
+    def draw_profiler(self):
+        # Recent p50 / p95 / max per phase, plus a small histogram of the samples
+        rect = self.profiler_rect
+        font = get_font('Arial', 14)
+        self.screen.fill((30, 30, 30), rect)
+        pygame.draw.rect(self.screen, self.WHITE, rect, 1)
+        
+        self.screen.blit(render_text(font, "Phase (ms)", self.WHITE), (rect.x + 8, rect.y + 6))
+        self.screen.blit(render_text(font, "p50 / p95 / max", self.WHITE), (rect.x + 170, rect.y + 6))
+        self.screen.blit(render_text(font, "F3", self.WHITE), (rect.x + 292, rect.y + 6))
+        
+        y_offset = rect.y + 28
+        for name in PROFILED_PHASES:
+            self.screen.blit(render_text(font, name, self.WHITE), (rect.x + 8, y_offset))
+            
+            stats = self.profiler.stats(name)
+            if stats is not None:
+                numbers = f"{stats['p50_ms']:.2f} / {stats['p95_ms']:.2f} / {stats['max_ms']:.2f}"
+                self.screen.blit(render_text(font, numbers, self.WHITE), (rect.x + 170, y_offset))
+                
+                # One bar per bucket, scaled to the fullest bucket
+                counts = self.profiler.histogram(name)
+                tallest = max(counts)
+                for i, count in enumerate(counts):
+                    height = 14 * count // tallest
+                    if height:
+                        bar = pygame.Rect(rect.x + 292 + i * 6, y_offset + 15 - height, 5, height)
+                        pygame.draw.rect(self.screen, self.GREEN, bar)
+            
+            y_offset += 20
+
     def draw_game_over(self):
         # Dim the screen
-        dim_surface = pygame.Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
-        dim_surface.fill(self.BLACK)
-        dim_surface.set_alpha(150)
-        self.screen.blit(dim_surface, (0, 0))
+        if self.dim_surface is None:
+            self.dim_surface = pygame.Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+            self.dim_surface.fill(self.BLACK)
+            self.dim_surface.set_alpha(150)
+        self.screen.blit(self.dim_surface, (0, 0))
         
         # Draw game over text
-        font_large = pygame.font.SysFont('Arial', 48)
-        game_over_text = font_large.render("You Won!", True, self.GREEN)
+        font_large = get_font('Arial', 48)
+        game_over_text = render_text(font_large, "You Won!", self.GREEN)
         text_rect = game_over_text.get_rect(center=(self.SCREEN_WIDTH // 2, self.SCREEN_HEIGHT // 2 - 50))
         self.screen.blit(game_over_text, text_rect)
         
         # Draw turn count
-        turns_text = self.font.render(f"Completed in {self.turn_count} turns", True, self.WHITE)
+        turns_text = render_text(self.font, f"Completed in {self.sim.turn_count} turns", self.WHITE)
         turns_rect = turns_text.get_rect(center=(self.SCREEN_WIDTH // 2, self.SCREEN_HEIGHT // 2))
         self.screen.blit(turns_text, turns_rect)
         
         # Draw continue prompt
-        continue_text = self.font.render("Click anywhere to return to menu and start new game", True, self.WHITE)
+        continue_text = render_text(self.font, "Click anywhere to return to menu and start new game", self.WHITE)
         continue_rect = continue_text.get_rect(center=(self.SCREEN_WIDTH // 2, self.SCREEN_HEIGHT // 2 + 50))
         self.screen.blit(continue_text, continue_rect)
 
+    def time_until_redraw(self):
+        """Milliseconds until the screen changes on its own, or None if it never will"""
+        if self.game_state == "playing" and self.drawn_hint is not None and not self.live_hints:
+            # The hint box disappears when it expires
+            return max(0, self.hint_display_time + HINT_DURATION_MS - pygame.time.get_ticks())
+        return None
+
+    def wait_for_events(self):
+        """Sleep until there is input or a redraw falls due, then return the pending events"""
+        if self.needs_redraw:
+            return pygame.event.get()
+        
+        timeout = self.idle_timeout_ms
+        deadline = self.time_until_redraw()
+        if deadline is not None:
+            timeout = min(timeout, deadline)
+        if timeout <= 0:
+            return pygame.event.get()
+        
+        event = pygame.event.wait(timeout)
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
+
     def run(self):
-        # Main game loop
+        # Main game loop: block while idle, draw only when something changed
         while True:
-            self.handle_events()
-            self.draw()
-            self.clock.tick(60)
+            events = self.wait_for_events()
+            with self.profiler.phase("handle_events"):
+                self.handle_events(events)
+            self.update()
+            
+            if self.needs_redraw or self.time_until_redraw() == 0:
+                with self.profiler.phase("draw"):
+                    self.draw()
+                self.needs_redraw = False
+                
+                # Cap the frame rate while frames keep coming (key repeat, mouse moves)
+                self.clock.tick(self.max_fps)
+            
+            self.profiler.end_frame()
 
 # Run the game
 if __name__ == "__main__":
-    game = MindMazeGame()
+    parser = argparse.ArgumentParser(description="MindMaze: AI-Powered Labyrinth")
+    parser.add_argument("--size", type=int, default=15, help="board width and height")
+    parser.add_argument("--profile", action="store_true", help="time frame phases from the start (F3 shows them)")
+    parser.add_argument("--profile-log", help="append per-frame phase timings to this JSON-lines file")
+    parser.add_argument("--record", help="write a replay log of the session to this file (see replay.py)")
+    parser.add_argument("--live-hints", action="store_true", help="keep the AI's predicted modifications on screen")
+    args = parser.parse_args()
+    if args.size < 2:
+        parser.error("--size must be at least 2")
+    
+    # A saved Q-table only fits the board size it was built for
+    q_table_path = DEFAULT_Q_TABLE_PATH
+    if args.size != 15:
+        q_table_path = f"{DEFAULT_Q_TABLE_PATH}-{args.size}x{args.size}"
+    game = MindMazeGame(q_table_path=q_table_path, maze_width=args.size, maze_height=args.size,
+                        profile=args.profile, profile_log=args.profile_log, record_path=args.record,
+                        live_hints=args.live_hints)
     game.run()
\ No newline at end of file
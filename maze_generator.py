@@ -1,90 +1,222 @@
 import numpy as np
+import os
 import random
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+
+# Grid formats returned by MazeGenerator.generate()
+OUTPUT_INT = "int"        # legacy platform-int grid
+OUTPUT_UINT8 = "uint8"    # one byte per cell
+OUTPUT_PACKED = "packed"  # one bit per cell, rows packed with np.packbits
+OUTPUT_MODES = (OUTPUT_INT, OUTPUT_UINT8, OUTPUT_PACKED)
+
+# Direction orders for the carving walk, keyed by lattice stride
+_DIRECTION_ORDERS_CACHE = {}
+
+
+def unpack_maze(packed, width):
+    """Expand a bit-packed maze back into a uint8 grid of 0 (wall) / 1 (path)"""
+    return np.unpackbits(packed, axis=-1, count=width)
+
+
+def _generate_chunk(width, height, loop_density, seeds, output):
+    """Worker entry point for generate_batch: build one maze per seed"""
+    mazes = []
+    for seed in seeds:
+        generator = MazeGenerator(width, height, loop_density, rng=random.Random(seed))
+        mazes.append(generator.generate(output))
+    if not mazes:
+        # Empty batch: no mazes, but the shape and dtype of the requested format
+        row_width = -(-width // 8) if output == OUTPUT_PACKED else width
+        return np.zeros((0, height, row_width), dtype=int if output == OUTPUT_INT else np.uint8)
+    return np.stack(mazes)
+
 
 class MazeGenerator:
-    def __init__(self, width, height):
+    def __init__(self, width, height, loop_density=0.1, rng=None):
         self.width = width
         self.height = height
+        
+        # Fraction of cells drawn as loop candidates after carving
+        self.loop_density = loop_density
+        
+        # Random source (anything with the random module's API), global by default
+        self.rng = rng if rng is not None else random
     
-    def generate(self):
-        """Generate a random maze using depth-first search with recursive backtracking"""
-        # Initialize maze with walls (0)
-        maze = np.zeros((self.height, self.width), dtype=int)
+    def generate(self, output=OUTPUT_INT):
+        """Generate a random maze using depth-first search with backtracking
         
-        # Starting position (top-left)
-        start_x, start_y = 0, 0
+        output selects the grid format: "int" (default), "uint8" or "packed"
+        (bit-packed rows, see unpack_maze).
+        """
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode {output!r}, expected one of {OUTPUT_MODES}")
         
-        # Mark start position as path
-        maze[start_y][start_x] = 1
+        # Initialize maze with walls (0)
+        maze = np.zeros((self.height, self.width), dtype=np.uint8)
         
-        # Recursive backtracking to generate maze
-        self._generate_recursive(maze, start_x, start_y)
+        # Carve from the start position (top-left) without recursion
+        self._carve_iterative(maze)
         
         # Ensure the goal (center) is accessible
         center_x, center_y = self.width // 2, self.height // 2
-        maze[center_y][center_x] = 1
+        maze[center_y, center_x] = 1
         
         # Make sure there's a path to the center by connecting it to a neighboring path
         connected = False
         for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
             nx, ny = center_x + dx, center_y + dy
             if 0 <= nx < self.width and 0 <= ny < self.height:
-                if maze[ny][nx] == 1:
+                if maze[ny, nx] == 1:
                     connected = True
                     break
         
         if not connected:
             # Connect to a random neighbor
             directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-            random.shuffle(directions)
+            self.rng.shuffle(directions)
             for dx, dy in directions:
                 nx, ny = center_x + dx, center_y + dy
                 if 0 <= nx < self.width and 0 <= ny < self.height:
-                    maze[ny][nx] = 1
+                    maze[ny, nx] = 1
                     break
         
         # Add some random paths to make the maze more interesting
         self._add_random_paths(maze)
         
+        if output == OUTPUT_PACKED:
+            return np.packbits(maze, axis=-1)
+        if output == OUTPUT_INT:
+            return maze.astype(int)
         return maze
     
-    def _generate_recursive(self, maze, x, y):
-        """Recursive function to generate maze using depth-first search"""
-        # Define possible directions: right, down, left, up
-        directions = [(2, 0), (0, 2), (-2, 0), (0, -2)]
-        random.shuffle(directions)
-        
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            
-            # Check if the new position is within maze bounds
-            if 0 <= nx < self.width and 0 <= ny < self.height:
-                # If the cell is unvisited (it's a wall)
-                if maze[ny][nx] == 0:
-                    # Mark the cell and the cell between as path
-                    maze[ny][nx] = 1
-                    maze[y + dy//2][x + dx//2] = 1
-                    
-                    # Continue from the new position
-                    self._generate_recursive(maze, nx, ny)
+    def generate_batch(self, n, seed=None, workers=None, path=None, output=OUTPUT_UINT8):
+        """Generate n mazes across a process pool and return them stacked as one array
+        
+        Each maze gets its own seed from a SeedSequence rooted at seed, so the same seed
+        gives bit-identical output whatever the number of workers. If path is given the
+        batch is also saved there (.npz files keep the per-maze seeds too).
+        """
+        if output not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode {output!r}, expected one of {OUTPUT_MODES}")
+        if n < 0:
+            raise ValueError(f"Cannot generate {n} mazes")
+        
+        maze_seeds = np.random.SeedSequence(seed).generate_state(n, dtype=np.uint64)
+        seed_list = [int(s) for s in maze_seeds]
+        
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, n))
+        
+        if workers == 1:
+            mazes = _generate_chunk(self.width, self.height, self.loop_density, seed_list, output)
+        else:
+            # A few chunks per worker keeps the pool busy without per-maze IPC
+            chunk_size = max(1, -(-n // (workers * 4)))
+            chunks = [seed_list[i:i + chunk_size] for i in range(0, n, chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(
+                    _generate_chunk,
+                    [self.width] * len(chunks),
+                    [self.height] * len(chunks),
+                    [self.loop_density] * len(chunks),
+                    chunks,
+                    [output] * len(chunks)
+                )
+                mazes = np.concatenate(list(results))
+        
+        if path is not None:
+            if str(path).endswith(".npz"):
+                np.savez_compressed(path, mazes=mazes, seeds=maze_seeds)
+            else:
+                np.save(path, mazes)
+        
+        return mazes
     
-    def _add_random_paths(self, maze):
-        """Add some random paths to make the maze more interesting"""
-        # Add random paths (about 10% of the total cells)
-        num_random_paths = (self.width * self.height) // 10
-        
-        for _ in range(num_random_paths):
-            x = random.randint(0, self.width - 1)
-            y = random.randint(0, self.height - 1)
-            
-            # Determine if there's at least one neighboring path
-            has_path_neighbor = False
-            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < self.width and 0 <= ny < self.height and maze[ny][nx] == 1:
-                    has_path_neighbor = True
+    def _carve_iterative(self, maze):
+        """Carve a perfect maze into the grid using depth-first search with an explicit stack
+
+        Cells live on the even coordinates of the grid, exactly like the old recursive
+        version. The lattice is padded with a ring of already-visited sentinel cells so the
+        inner loop needs no bounds checks, and every cell gets one random direction order
+        up front (the same "shuffle once, then try each direction" walk as before).
+        """
+        cells_w = (self.width + 1) // 2
+        cells_h = (self.height + 1) // 2
+        stride = cells_w + 2
+        
+        # Everything starts visited, then the interior of the padded lattice is cleared
+        visited = bytearray(b"\x01") * (stride * (cells_h + 2))
+        for cy in range(cells_h):
+            row_start = (cy + 1) * stride + 1
+            visited[row_start:row_start + cells_w] = bytes(cells_w)
+        
+        # parent[cell] is the lattice cell we carved in from (0 = not carved)
+        parent = array('q', bytes(8 * len(visited)))
+        
+        # One of the 24 direction orders per cell, drawn in a single batch
+        orders = _DIRECTION_ORDERS_CACHE.get(stride)
+        if orders is None:
+            orders = list(permutations((1, -1, stride, -stride)))
+            _DIRECTION_ORDERS_CACHE[stride] = orders
+        np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        order_of = np_rng.integers(0, len(orders), len(visited), dtype=np.uint8).tolist()
+        
+        start = stride + 1
+        visited[start] = 1
+        stack = [start]
+        push = stack.append
+        pop = stack.pop
+        
+        while stack:
+            cell = stack[-1]
+            for offset in orders[order_of[cell]]:
+                nxt = cell + offset
+                if not visited[nxt]:
+                    visited[nxt] = 1
+                    parent[nxt] = cell
+                    push(nxt)
                     break
-            
-            # If there's a neighboring path, make this cell a path too
-            if has_path_neighbor:
-                maze[y][x] = 1
\ No newline at end of file
+            else:
+                pop()
+        
+        # Every lattice cell is reachable, so all of them become paths
+        maze[0:cells_h * 2:2, 0:cells_w * 2:2] = 1
+        
+        # Open the wall between each carved cell and its parent
+        parent = np.frombuffer(parent, dtype=np.int64)
+        children = np.flatnonzero(parent)
+        parents = parent[children]
+        child_y, child_x = np.divmod(children, stride)
+        parent_y, parent_x = np.divmod(parents, stride)
+        # Padded lattice coords -> grid coords: (c - 1) * 2, so the midpoint is c_child + c_parent - 2
+        maze[child_y + parent_y - 2, child_x + parent_x - 2] = 1
+    
+    def _add_random_paths(self, maze):
+        """Add some random paths to make the maze more interesting
+        
+        All candidate cells are drawn in one batch and kept only if they touch a path
+        cell of the carved maze, found with shifted copies of the grid.
+        """
+        # Add random paths (loop_density of the total cells, 10% by default)
+        num_random_paths = int(self.width * self.height * self.loop_density)
+        if num_random_paths <= 0:
+            return
+        
+        np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        xs = np_rng.integers(0, self.width, num_random_paths)
+        ys = np_rng.integers(0, self.height, num_random_paths)
+        
+        # Mark every cell that has at least one neighboring path
+        is_path = maze == 1
+        has_path_neighbor = np.zeros_like(is_path)
+        has_path_neighbor[1:, :] |= is_path[:-1, :]
+        has_path_neighbor[:-1, :] |= is_path[1:, :]
+        has_path_neighbor[:, 1:] |= is_path[:, :-1]
+        has_path_neighbor[:, :-1] |= is_path[:, 1:]
+        
+        # Open the candidates next to a path
+        keep = has_path_neighbor[ys, xs]
+        maze[ys[keep], xs[keep]] = 1
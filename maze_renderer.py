@@ -0,0 +1,142 @@
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from simulation import TILE_NONE, TILE_SHORTCUT, TILE_TELEPORTER, TILE_TRAP
+
+
+class MazeRenderer:
+    """Maze drawn through cached chunk surfaces of chunk_size x chunk_size cells
+
+    Only the chunks a Viewport can see are rendered, each the first time it comes
+    into view. A chunk is rendered in bulk: the maze and tile layers are mapped
+    through a palette to one RGB pixel per cell, scaled up to cell size with
+    NumPy and pushed with surfarray.blit_array. Chunks stay cached until their
+    pixels exceed cache_pixels, then the least recently used go first. A cell
+    the simulation reports as changed is patched in its cached chunk (if any),
+    so a frame where nothing moved costs only the blits of the visible chunks.
+    """
+
+    def __init__(self, maze_width, maze_height, cell_size, colors, chunk_size=32, cache_pixels=16 * 2**20):
+        self.maze_width = maze_width
+        self.maze_height = maze_height
+        self.cell_size = cell_size
+        self.chunk_size = chunk_size
+        self.cache_pixels = cache_pixels
+        # Keys: path, wall, border, goal, trap, teleporter, shortcut
+        self.colors = colors
+        self.tile_palette = {
+            TILE_TRAP: colors["trap"],
+            TILE_TELEPORTER: colors["teleporter"],
+            TILE_SHORTCUT: colors["shortcut"],
+        }
+
+        # Colour index per cell: 0 wall, 1 path, 2 goal, 2 + tile type for special tiles
+        self.palette = np.array([
+            colors["wall"],
+            colors["path"],
+            colors["goal"],
+            colors["trap"],
+            colors["teleporter"],
+            colors["shortcut"],
+        ], dtype=np.uint8)
+        self.border = np.array(colors["border"], dtype=np.uint8)
+
+        # (chunk_x, chunk_y) -> Surface, least recently used first
+        self.chunks = OrderedDict()
+        self.cached_pixels = 0
+
+    def clear(self):
+        """Drop every cached chunk (e.g. after a new maze was generated)"""
+        self.chunks.clear()
+        self.cached_pixels = 0
+
+    def set_cell_size(self, cell_size):
+        """Switch to a new zoom level; cached chunks are at the old size, so drop them"""
+        if cell_size != self.cell_size:
+            self.cell_size = cell_size
+            self.clear()
+
+    def render_cells(self, sim, cells):
+        """Patch the given cells into the chunks that are cached"""
+        chunk_size = self.chunk_size
+        for x, y in cells:
+            chunk_x, chunk_y = x // chunk_size, y // chunk_size
+            surface = self.chunks.get((chunk_x, chunk_y))
+            if surface is not None:
+                color = self._cell_color(sim.maze[y, x], sim.tiles[y, x], (x, y) == sim.goal_pos)
+                self._draw_cell(surface, x - chunk_x * chunk_size, y - chunk_y * chunk_size, color)
+
+    def draw(self, screen, sim, viewport):
+        """Blit the chunks that overlap the viewport's visible cells"""
+        chunk_size = self.chunk_size
+        span = chunk_size * self.cell_size
+        x0, y0, x1, y1 = viewport.visible_cells()
+        for chunk_y in range(y0 // chunk_size, -(-y1 // chunk_size)):
+            for chunk_x in range(x0 // chunk_size, -(-x1 // chunk_size)):
+                surface = self._get_chunk(sim, chunk_x, chunk_y)
+                screen.blit(surface, (viewport.offset_x + chunk_x * span, viewport.offset_y + chunk_y * span))
+
+    def _get_chunk(self, sim, chunk_x, chunk_y):
+        """Get a chunk surface from the cache, rendering it if needed"""
+        key = (chunk_x, chunk_y)
+        surface = self.chunks.get(key)
+        if surface is not None:
+            self.chunks.move_to_end(key)
+            return surface
+
+        surface = self._render_chunk(sim, chunk_x, chunk_y)
+        self.chunks[key] = surface
+        self.cached_pixels += surface.get_width() * surface.get_height()
+
+        # Evict old chunks, but never the one we are about to draw
+        while self.cached_pixels > self.cache_pixels and len(self.chunks) > 1:
+            _, evicted = self.chunks.popitem(last=False)
+            self.cached_pixels -= evicted.get_width() * evicted.get_height()
+        return surface
+
+    def _render_chunk(self, sim, chunk_x, chunk_y):
+        """Render one chunk into a new surface with a few array operations"""
+        x0 = chunk_x * self.chunk_size
+        y0 = chunk_y * self.chunk_size
+        x1 = min(x0 + self.chunk_size, self.maze_width)
+        y1 = min(y0 + self.chunk_size, self.maze_height)
+        cell_size = self.cell_size
+
+        # Work in (x, y) order, which is what surfarray expects
+        maze = sim.maze[y0:y1, x0:x1].T
+        tiles = sim.tiles[y0:y1, x0:x1].T
+        index = (maze == 1).astype(np.uint8)
+        goal_x, goal_y = sim.goal_pos
+        if x0 <= goal_x < x1 and y0 <= goal_y < y1:
+            index[goal_x - x0, goal_y - y0] = 2
+        index = np.where(tiles != TILE_NONE, tiles + 2, index)
+
+        # One pixel per cell, scaled up to cell size
+        cells = pygame.Surface(index.shape)
+        pygame.surfarray.blit_array(cells, self.palette[index])
+        surface = pygame.transform.scale(cells, (index.shape[0] * cell_size, index.shape[1] * cell_size))
+
+        # Paint the one-pixel cell borders straight into the surface's pixels
+        pixels = pygame.surfarray.pixels3d(surface)
+        pixels[::cell_size] = self.border
+        pixels[cell_size - 1::cell_size] = self.border
+        pixels[:, ::cell_size] = self.border
+        pixels[:, cell_size - 1::cell_size] = self.border
+        del pixels  # Unlocks the surface
+        return surface
+
+    def _cell_color(self, value, tile, is_goal):
+        """Colour of a cell: its special tile, else the goal, else path or wall"""
+        if tile != TILE_NONE:
+            return self.tile_palette[tile]
+        if is_goal:
+            return self.colors["goal"]
+        return self.colors["path"] if value == 1 else self.colors["wall"]
+
+    def _draw_cell(self, surface, column, row, color):
+        """Fill one cell of a chunk surface and draw its border"""
+        rect = pygame.Rect(column * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size)
+        surface.fill(color, rect)
+        pygame.draw.rect(surface, self.colors["border"], rect, 1)
@@ -0,0 +1,140 @@
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Histogram bucket upper edges, in milliseconds (the last bucket is open-ended)
+HISTOGRAM_EDGES_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66)
+
+
+class _NullPhase:
+    """Stand-in timer used while profiling is off; entering and leaving it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """Timer for one named phase; each use records one sample
+
+    A phase object is shared by every use of its name, so one name must not be
+    timed on two threads at once.
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class FrameProfiler:
+    """Per-phase timers with rolling histograms and optional JSON-lines export
+
+    Wrap code in `with profiler.phase("draw"):`. While the profiler is disabled,
+    phase() hands back a shared no-op object, so instrumented code pays one
+    method call. While enabled, each use keeps its duration among the last
+    `window` samples of that phase. end_frame() closes a frame, writing the
+    per-phase totals of that frame as one JSON line if an export path was given.
+    Samples recorded on another thread (the AI planner) count toward whichever
+    frame is open when they finish; a lock keeps them from racing the main
+    thread's reads.
+    """
+
+    def __init__(self, enabled=False, window=240, export_path=None):
+        self.enabled = enabled
+        self.window = window
+        self.export_path = export_path
+        self.export_file = None
+        self.frame_count = 0
+
+        self.phases = {}
+        self.samples = {}  # name -> deque of the latest durations in seconds
+        self.frame_totals = {}  # name -> seconds spent in the current frame
+        self.lock = threading.Lock()  # Guards samples and frame_totals
+
+    def phase(self, name):
+        """Get a context manager that times one run of the named phase"""
+        if not self.enabled:
+            return _NULL_PHASE
+        timer = self.phases.get(name)
+        if timer is None:
+            timer = _Phase(self, name)
+            self.phases[name] = timer
+        return timer
+
+    def record(self, name, seconds):
+        """Add one sample for a phase (timed some other way)"""
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = deque(maxlen=self.window)
+                self.samples[name] = samples
+            samples.append(seconds)
+            self.frame_totals[name] = self.frame_totals.get(name, 0.0) + seconds
+
+    def end_frame(self):
+        """Close the current frame and export its per-phase totals"""
+        if not self.enabled:
+            return
+        with self.lock:
+            frame_totals = self.frame_totals
+            self.frame_totals = {}
+        if not frame_totals:
+            return
+        self.frame_count += 1
+
+        if self.export_path is not None:
+            if self.export_file is None:
+                self.export_file = open(self.export_path, "a")
+            record = {"frame": self.frame_count, "time": time.time()}
+            record.update({name: seconds * 1000 for name, seconds in frame_totals.items()})
+            self.export_file.write(json.dumps(record) + "\n")
+
+    def stats(self, name):
+        """Summary of a phase's recent samples in milliseconds, or None if it never ran"""
+        samples = self._snapshot(name)
+        if not samples:
+            return None
+        values = np.asarray(samples) * 1000
+        return {
+            "count": len(values),
+            "mean_ms": float(values.mean()),
+            "p50_ms": float(np.percentile(values, 50)),
+            "p95_ms": float(np.percentile(values, 95)),
+            "max_ms": float(values.max()),
+        }
+
+    def histogram(self, name):
+        """Counts of a phase's recent samples per HISTOGRAM_EDGES_MS bucket"""
+        samples = self._snapshot(name)
+        if not samples:
+            return [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+        buckets = np.searchsorted(HISTOGRAM_EDGES_MS, np.asarray(samples) * 1000)
+        return np.bincount(buckets, minlength=len(HISTOGRAM_EDGES_MS) + 1).tolist()
+
+    def _snapshot(self, name):
+        """Copy a phase's recent samples, so another thread can keep recording"""
+        with self.lock:
+            return list(self.samples.get(name, ()))
+
+    def close(self):
+        """Flush and close the export file"""
+        if self.export_file is not None:
+            self.export_file.close()
+            self.export_file = None
@@ -0,0 +1,264 @@
+import json
+import os
+
+import numpy as np
+
+
+class QTable:
+    """Q-values stored as one NumPy row per interned state
+
+    Each state seen by an update gets a small integer row id; the row holds the
+    Q-value of every action, indexed by action id. States that were never
+    updated have no row and read as all zeros. Every row also has a version
+    number that goes up whenever the row changes, so results derived from a
+    row can be cached and checked for staleness cheaply.
+    """
+
+    def __init__(self, num_actions, initial_capacity=64, dtype=np.float32):
+        self.num_actions = num_actions
+        self.dtype = np.dtype(dtype)
+        self.values, self.states = self._allocate(initial_capacity)
+        self.state_rows = {}  # state code -> row id
+        self.row_versions = []  # row id -> update count
+        self.num_rows = 0
+
+    def __len__(self):
+        return self.num_rows
+
+    def row(self, state):
+        """Get the Q-value row for a state, or None if it has never been updated"""
+        row_id = self.state_rows.get(state)
+        if row_id is None:
+            return None
+        return self.values[row_id]
+
+    def row_version(self, state):
+        """Get the version of a state's row, or None if it has never been updated"""
+        row_id = self.state_rows.get(state)
+        if row_id is None:
+            return None
+        return self.row_versions[row_id]
+
+    def intern(self, state):
+        """Get the row id for a state, allocating a zeroed row if needed"""
+        row_id = self.state_rows.get(state)
+        if row_id is None:
+            if self.num_rows == len(self.values):
+                self._grow()
+            row_id = self.num_rows
+            self.states[row_id] = state
+            self.state_rows[state] = row_id
+            self.row_versions.append(0)
+            self.num_rows += 1
+        return row_id
+
+    def get(self, state, action):
+        """Get a single Q-value (0.0 for unseen states)"""
+        row_id = self.state_rows.get(state)
+        if row_id is None:
+            return 0.0
+        return float(self.values[row_id, action])
+
+    def set(self, state, action, value):
+        """Set a single Q-value"""
+        # Intern first: growing the table replaces self.values
+        row_id = self.intern(state)
+        self.values[row_id, action] = value
+        self.row_versions[row_id] += 1
+
+    def touch(self, row_ids):
+        """Bump the versions of rows that were written through self.values directly"""
+        for row_id in np.unique(row_ids).tolist():
+            self.row_versions[row_id] += 1
+
+    def flush(self):
+        """Persist pending changes (nothing to do for an in-memory table)"""
+
+    def _allocate(self, capacity):
+        """Create zeroed value and state-code arrays with room for capacity rows"""
+        values = np.zeros((capacity, self.num_actions), dtype=self.dtype)
+        states = np.zeros(capacity, dtype=np.int64)
+        return values, states
+
+    def _grow(self):
+        """Double the row capacity"""
+        values, states = self._allocate(max(1, len(self.values)) * 2)
+        values[:self.num_rows] = self.values[:self.num_rows]
+        states[:self.num_rows] = self.states[:self.num_rows]
+        self.values, self.states = values, states
+
+
+class VisitCountingQTable(QTable):
+    """In-memory QTable that counts the updates to each entry since the last drain
+
+    The value an entry had before its first update is kept as well, so
+    drain_deltas() can report exactly what changed: which entries were
+    updated, how far each one moved and how many updates moved it. Training
+    workers use this to ship their learning to a parent process.
+    """
+
+    def __init__(self, num_actions, initial_capacity=64, dtype=np.float32):
+        super().__init__(num_actions, initial_capacity, dtype)
+        self.visits = np.zeros(self.values.shape, dtype=np.uint32)
+        self.base = np.zeros(self.values.shape, dtype=self.dtype)
+
+    def set(self, state, action, value):
+        """Set a single Q-value, counting it as one visit"""
+        row_id = self.intern(state)
+        if self.visits[row_id, action] == 0:
+            self.base[row_id, action] = self.values[row_id, action]
+        self.visits[row_id, action] += 1
+        self.values[row_id, action] = value
+        self.row_versions[row_id] += 1
+
+    def load(self, states, actions, values):
+        """Overwrite entries (e.g. with merged values) without counting visits"""
+        unique_states, state_index = np.unique(states, return_inverse=True)
+        row_ids = np.array([self.intern(state) for state in unique_states.tolist()], dtype=np.int64)
+        self.values[row_ids[state_index], actions] = values
+        self.touch(row_ids)
+
+    def drain_deltas(self):
+        """Return (states, actions, deltas, visits) for every entry updated since the last drain
+
+        The counts start again from zero afterwards.
+        """
+        row_ids, actions = self.visits.nonzero()
+        deltas = self.values[row_ids, actions] - self.base[row_ids, actions]
+        visits = self.visits[row_ids, actions]
+        self.visits[row_ids, actions] = 0
+        return self.states[row_ids], actions, deltas, visits
+
+    def _grow(self):
+        """Double the row capacity, visit counts and base values included"""
+        super()._grow()
+        for name in ("visits", "base"):
+            old = getattr(self, name)
+            grown = np.zeros(self.values.shape, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+
+class PersistentQTable(QTable):
+    """QTable kept in memory-mapped .npy files so it survives across games and restarts
+
+    The directory holds the Q-value matrix, the state code of every row and a small
+    meta.json with the row count and board size. Opening only maps the files and
+    rebuilds the state -> row dict from the code array. Updates write straight into
+    the mapping, and flush() makes them durable. After a crash, rows that existed
+    at the last flush keep whatever updates the OS had already written back, so
+    some unflushed values can survive. Rows added since the last flush are
+    ignored on load and zeroed before they are handed to new states, so their
+    old values never leak into other states. There should be only one writer
+    process per directory.
+    """
+
+    META_FILE = "meta.json"
+    # A fresh table starts with a row per board cell (at least 1024), as long as
+    # the files stay under this size; bigger boards start smaller and grow
+    INITIAL_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, path, num_actions, maze_width, maze_height, initial_capacity=None, dtype=np.float32):
+        self.path = path
+        self.maze_width = maze_width
+        self.maze_height = maze_height
+        self.num_actions = num_actions
+        self.dtype = np.dtype(dtype)
+        os.makedirs(path, exist_ok=True)
+
+        meta = self._read_meta()
+        if meta is None:
+            # Fresh table
+            if initial_capacity is None:
+                initial_capacity = self._initial_capacity()
+            self.values, self.states = self._allocate(initial_capacity)
+            self.state_rows = {}
+            self.row_versions = []
+            self.num_rows = 0
+            self.stale_rows = 0
+            self.flush()
+            return
+
+        if (meta["num_actions"], meta["maze_width"], meta["maze_height"]) != (num_actions, maze_width, maze_height):
+            raise ValueError(
+                f"Q-table at {path} was built for a {meta['maze_width']}x{meta['maze_height']} board "
+                f"with {meta['num_actions']} actions"
+            )
+
+        # Warm start: map the existing files in place
+        self.values = np.lib.format.open_memmap(os.path.join(path, meta["values_file"]), mode="r+")
+        self.states = np.lib.format.open_memmap(os.path.join(path, meta["states_file"]), mode="r+")
+        self.num_rows = meta["num_rows"]
+        self.state_rows = dict(zip(self.states[:self.num_rows].tolist(), range(self.num_rows)))
+        self.row_versions = [0] * self.num_rows
+
+        # Rows past num_rows may hold values from a session that never flushed
+        self.stale_rows = len(self.values)
+
+    def intern(self, state):
+        """Get the row id for a state, zeroing rows left over from an unflushed session"""
+        is_new = state not in self.state_rows
+        row_id = super().intern(state)
+        if is_new and row_id < self.stale_rows:
+            self.values[row_id] = 0
+        return row_id
+
+    def flush(self):
+        """Write mapped pages to disk and record the row count"""
+        self.values.flush()
+        self.states.flush()
+        self._write_meta()
+
+    def _initial_capacity(self):
+        """Starting row count sized to the board and capped by INITIAL_BYTES"""
+        row_bytes = self.num_actions * self.dtype.itemsize
+        return min(max(1024, self.maze_width * self.maze_height), max(64, self.INITIAL_BYTES // row_bytes))
+
+    def _allocate(self, capacity):
+        """Create a new pair of mapped files with room for capacity rows"""
+        values = np.lib.format.open_memmap(
+            os.path.join(self.path, f"values-{capacity}.npy"),
+            mode="w+", dtype=self.dtype, shape=(capacity, self.num_actions)
+        )
+        states = np.lib.format.open_memmap(
+            os.path.join(self.path, f"states-{capacity}.npy"),
+            mode="w+", dtype=np.int64, shape=(capacity,)
+        )
+        return values, states
+
+    def _grow(self):
+        """Move to files of twice the size, then drop the old ones"""
+        old_files = [self.values.filename, self.states.filename]
+        super()._grow()
+
+        # Only the live rows were copied over, so the new files hold no stale rows
+        self.stale_rows = 0
+
+        # Point the metadata at the new files before the old ones go away
+        self.flush()
+        for filename in old_files:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _read_meta(self):
+        """Load meta.json, or None for a new directory"""
+        meta_path = os.path.join(self.path, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as meta_file:
+            return json.load(meta_file)
+
+    def _write_meta(self):
+        """Atomically replace meta.json"""
+        meta = {
+            "num_actions": self.num_actions,
+            "maze_width": self.maze_width,
+            "maze_height": self.maze_height,
+            "num_rows": self.num_rows,
+            "values_file": os.path.basename(self.values.filename),
+            "states_file": os.path.basename(self.states.filename),
+        }
+        meta_path = os.path.join(self.path, self.META_FILE)
+        with open(meta_path + ".tmp", "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(meta_path + ".tmp", meta_path)
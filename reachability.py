@@ -0,0 +1,279 @@
+from collections import deque
+
+# Orthogonal neighbours, in the same order the game scans them
+NEIGHBOR_OFFSETS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+class ReachabilityTracker:
+    """Keeps player-to-goal reachability up to date while the maze changes
+
+    The tracker holds one witness path through open cells, stored from the goal
+    (index 0) to the player (last index), plus a position -> index map. Any flip
+    that misses the witness cannot cut the route, so it costs O(1). Only a wall
+    placed on the witness starts a search. That search is a bidirectional BFS
+    from both sides of the cut and stops at the first detour it finds, or as
+    soon as one side runs out of cells (which means the flip would disconnect
+    the goal).
+    """
+
+    def __init__(self, maze, source, target):
+        # The maze is shared with the caller and edited in place through set_cell
+        self.maze = maze
+        self.height, self.width = maze.shape
+        self.target = tuple(target)
+        self.source = tuple(source)
+        self.path = None
+        self.index = {}
+        self.reset(source)
+
+    def reset(self, source=None):
+        """Rebuild the witness path from scratch (e.g. after the maze was replaced)"""
+        if source is not None:
+            self.source = tuple(source)
+        self.path = [self.target]
+        self.index = {self.target: 0}
+        self._attach_source()
+
+    def is_reachable(self):
+        """Check if the goal can currently be reached from the player"""
+        return self.path is not None
+
+    def move_source(self, x, y):
+        """Follow the player to a new position, reusing as much of the witness as possible"""
+        self.source = (x, y)
+        if self.path is not None:
+            self._attach_source()
+
+    def set_cell(self, x, y, value):
+        """Apply a wall/path flip unless it would cut the player off from the goal
+
+        Returns True if the flip was applied, False if it was rejected.
+        """
+        cell = (x, y)
+
+        # Opening a cell, or re-walling a wall, never removes a route
+        if value == 1 or self.maze[y, x] != 1:
+            self.maze[y, x] = value
+            return True
+
+        # Never wall in the endpoints themselves
+        if cell == self.source or cell == self.target:
+            return False
+
+        # Nothing to protect, or the flip misses the witness path
+        i = self.index.get(cell) if self.path is not None else None
+        if i is None:
+            self.maze[y, x] = value
+            return True
+
+        # The flip lands on the witness: look for a detour around it
+        self.maze[y, x] = value
+        detour = self._find_detour(i)
+        if detour is None:
+            # No detour exists, the goal would be cut off
+            self.maze[y, x] = 1
+            return False
+
+        self._splice(detour, i)
+        return True
+
+    def repair(self):
+        """Open the fewest walls needed to reconnect the player to the goal
+
+        Uses a 0-1 BFS where stepping into a wall costs 1. This scans the grid, but
+        it only runs when the route is already broken, which set_cell prevents.
+        Returns the list of cells that were opened.
+        """
+        if self.path is not None:
+            return []
+
+        start = self.source
+        cost = {start: 0}
+        parents = {start: None}
+        queue = deque([start])
+
+        while queue:
+            cell = queue.popleft()
+            if cell == self.target:
+                break
+            x, y = cell
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < self.width and 0 <= ny < self.height):
+                    continue
+                step = 0 if self.maze[ny, nx] == 1 else 1
+                new_cost = cost[cell] + step
+                nxt = (nx, ny)
+                if new_cost < cost.get(nxt, new_cost + 1):
+                    cost[nxt] = new_cost
+                    parents[nxt] = cell
+                    if step == 0:
+                        queue.appendleft(nxt)
+                    else:
+                        queue.append(nxt)
+
+        # Walk back from the goal, opening walls on the way
+        opened = []
+        route = self._chain(parents, self.target)
+        for x, y in route:
+            if self.maze[y, x] != 1:
+                self.maze[y, x] = 1
+                opened.append((x, y))
+
+        route.reverse()
+        self.path = route
+        self.index = {cell: i for i, cell in enumerate(route)}
+        return opened
+
+    def _open_neighbors(self, x, y):
+        """Yield the open cells next to (x, y)
+
+        The player's own cell always counts as open: a teleporter tile can be
+        walled in with the player standing on it, and they can still walk off.
+        """
+        maze = self.maze
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height and (
+                    maze[ny, nx] == 1 or (nx, ny) == self.source):
+                yield nx, ny
+
+    def _chain(self, parents, cell):
+        """Follow BFS parents back to the root, returned root first"""
+        chain = []
+        while cell is not None:
+            chain.append(cell)
+            cell = parents[cell]
+        chain.reverse()
+        return chain
+
+    def _attach_source(self):
+        """Reconnect the witness path to the current source position"""
+        path = self.path
+        index = self.index
+        source = self.source
+
+        # The player stepped back onto the witness: just drop the tail
+        j = index.get(source)
+        if j is not None:
+            self._truncate(j)
+            return
+
+        # Usual case: one step off the end of the witness. The old end can be a
+        # wall if the player was teleported onto a walled-in tile; the search
+        # below then drops it from the witness.
+        x, y = source
+        last_x, last_y = path[-1]
+        if (abs(last_x - x) + abs(last_y - y) == 1 and self.maze[y, x] == 1 and
+                self.maze[last_y, last_x] == 1):
+            index[source] = len(path)
+            path.append(source)
+            return
+
+        # Otherwise search outwards from the player until we touch the witness
+        parents = {source: None}
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            for nxt in self._open_neighbors(*cell):
+                if nxt in parents:
+                    continue
+                parents[nxt] = cell
+                j = index.get(nxt)
+                if j is not None:
+                    self._truncate(j)
+                    chain = self._chain(parents, nxt)
+                    for step in reversed(chain[:-1]):
+                        index[step] = len(path)
+                        path.append(step)
+                    return
+                queue.append(nxt)
+
+        # The player's component never touches the goal's
+        self.path = None
+        self.index = {}
+
+    def _truncate(self, j):
+        """Drop every witness cell after index j"""
+        for cell in self.path[j + 1:]:
+            del self.index[cell]
+        del self.path[j + 1:]
+
+    def _find_detour(self, i):
+        """Search for a walk joining the two halves of the witness cut at index i
+
+        Returns the walk as a list of cells running from the goal side to the player
+        side, or None if the halves are disconnected.
+        """
+        start_a = self.path[i - 1]  # goal side
+        start_b = self.path[i + 1]  # player side
+        parents_a = {start_a: None}
+        parents_b = {start_b: None}
+        queue_a = deque([start_a])
+        queue_b = deque([start_b])
+
+        # Grow whichever side has the smaller frontier; one side running dry proves a cut
+        while queue_a and queue_b:
+            if len(queue_a) <= len(queue_b):
+                walk = self._expand(queue_a, parents_a, parents_b, i, True)
+            else:
+                walk = self._expand(queue_b, parents_b, parents_a, i, False)
+            if walk is not None:
+                return walk
+
+        return None
+
+    def _expand(self, queue, parents, other_parents, i, goal_side):
+        """Expand one cell of a detour search, returning a joining walk if found"""
+        index = self.index
+        cell = queue.popleft()
+
+        for nxt in self._open_neighbors(*cell):
+            if nxt in parents:
+                continue
+            parents[nxt] = cell
+            j = index.get(nxt)
+
+            if goal_side:
+                # Reached the player's half of the witness, or the other search
+                if j is not None and j > i:
+                    return self._chain(parents, nxt)
+                if nxt in other_parents:
+                    return self._chain(parents, nxt) + self._chain(other_parents, nxt)[::-1][1:]
+            else:
+                # Reached the goal's half of the witness, or the other search
+                if j is not None and j < i:
+                    return self._chain(parents, nxt)[::-1]
+                if nxt in other_parents:
+                    return self._chain(other_parents, nxt) + self._chain(parents, nxt)[::-1][1:]
+
+            queue.append(nxt)
+
+        return None
+
+    def _splice(self, walk, i):
+        """Replace the witness segment around index i with the detour walk"""
+        index = self.index
+
+        # The last goal-side witness cell on the walk and the first player-side one after it
+        last_goal = 0
+        for pos, cell in enumerate(walk):
+            j = index.get(cell)
+            if j is not None and j < i:
+                last_goal = pos
+
+        first_player = len(walk) - 1
+        for pos in range(last_goal + 1, len(walk)):
+            j = index.get(walk[pos])
+            if j is not None and j > i:
+                first_player = pos
+                break
+
+        a = index[walk[last_goal]]
+        b = index[walk[first_player]]
+        new_tail = walk[last_goal + 1:first_player] + self.path[b:]
+
+        self._truncate(a)
+        for cell in new_tail:
+            index[cell] = len(self.path)
+            self.path.append(cell)
@@ -0,0 +1,226 @@
+"""Compact binary replay logs of MindMaze sessions, and a headless replayer
+
+A log is a short header followed by one record per event:
+
+    move      1 byte: the action (MOVE_UP/DOWN/LEFT/RIGHT)
+    game      tag, width, height, ai_modify_frequency (u16 each), seed (u64)
+    ai turn   tag, count (u8), then count x (x u16, y u16, value u8)
+    game end  tag, turn count (u32), CRC-32 of the final board state
+
+Every game runs from its seed, and the AI's modification sets are stored
+rather than re-planned, so a replay rebuilds the session exactly whatever the
+AI had learned at the time. Examples:
+
+    python main.py --record session.mmr
+    python replay.py session.mmr
+"""
+import argparse
+import struct
+import sys
+import time
+import zlib
+from collections import namedtuple
+
+from simulation import MazeSimulation
+
+MAGIC = b"MMRP"
+VERSION = 1
+
+# Record tags; moves are stored as their bare action value (0-3)
+TAG_GAME = 0x10
+TAG_AI_TURN = 0x11
+TAG_GAME_END = 0x12
+
+GAME_FORMAT = struct.Struct("<HHHQ")
+AI_TURN_FORMAT = struct.Struct("<B")
+MODIFICATION_FORMAT = struct.Struct("<HHB")
+GAME_END_FORMAT = struct.Struct("<II")
+
+# Largest board side the u16 fields can hold
+MAX_BOARD_SIDE = 0xFFFF
+
+# Outcome of replaying one game
+GameReplay = namedtuple("GameReplay", ["seed", "width", "height", "moves", "ai_turns", "turn_count", "matched"])
+
+
+def state_checksum(sim):
+    """CRC-32 of everything a replay has to reproduce: maze, tiles, player and turn count"""
+    checksum = zlib.crc32(sim.maze.tobytes())
+    checksum = zlib.crc32(sim.tiles.tobytes(), checksum)
+    return zlib.crc32(struct.pack("<III", sim.player.x, sim.player.y, sim.turn_count), checksum)
+
+
+class ReplayRecorder:
+    """Writes a MazeSimulation's games to a replay log as they are played
+
+    Pass it as MazeSimulation(recorder=...); the simulation reports each game
+    start, move, AI turn and game end to it. A game's header is only written
+    with its first move or AI turn, so games that were set up but never played
+    (e.g. the board waiting behind the menu at exit) leave nothing in the log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + bytes([VERSION]))
+        self.in_game = False
+        self.pending_header = None  # Header of a game with nothing recorded yet
+
+    def start_game(self, sim):
+        if sim.maze_width > MAX_BOARD_SIDE or sim.maze_height > MAX_BOARD_SIDE:
+            raise ValueError(f"boards larger than {MAX_BOARD_SIDE} cells per side cannot be recorded")
+        self.pending_header = bytes([TAG_GAME]) + GAME_FORMAT.pack(
+            sim.maze_width, sim.maze_height, sim.ai_modify_frequency, sim.seed
+        )
+        self.in_game = True
+
+    def record_move(self, action):
+        self._write(bytes([action]))
+
+    def record_ai_turn(self, modifications):
+        if len(modifications) > 0xFF:
+            raise ValueError("an AI turn can be recorded with at most 255 modifications")
+        record = bytearray([TAG_AI_TURN])
+        record += AI_TURN_FORMAT.pack(len(modifications))
+        for x, y, value in modifications:
+            record += MODIFICATION_FORMAT.pack(x, y, value)
+        self._write(record)
+
+    def end_game(self, sim):
+        """Close the current game with a checksum the replayer verifies"""
+        if not self.in_game:
+            return
+        self.in_game = False
+        if self.pending_header is not None:
+            # Nothing happened in this game; leave it out
+            self.pending_header = None
+            return
+        self.file.write(bytes([TAG_GAME_END]))
+        self.file.write(GAME_END_FORMAT.pack(sim.turn_count, state_checksum(sim)))
+
+    def _write(self, record):
+        """Write a record of the current game, preceded by its header if still pending"""
+        if self.pending_header is not None:
+            self.file.write(self.pending_header)
+            self.pending_header = None
+        self.file.write(record)
+
+    def close(self, sim=None):
+        """End the game in progress (if sim is given) and close the log"""
+        if sim is not None:
+            self.end_game(sim)
+        self.file.close()
+
+
+def read_records(data):
+    """Yield (tag, payload) for each record of a replay log's bytes
+
+    Moves come out as (action, None).
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a MindMaze replay log")
+    if data[len(MAGIC)] != VERSION:
+        raise ValueError(f"unsupported replay log version {data[len(MAGIC)]}")
+
+    offset = len(MAGIC) + 1
+    try:
+        while offset < len(data):
+            tag = data[offset]
+            offset += 1
+            if tag < 4:
+                yield tag, None
+            elif tag == TAG_GAME:
+                yield tag, GAME_FORMAT.unpack_from(data, offset)
+                offset += GAME_FORMAT.size
+            elif tag == TAG_AI_TURN:
+                (count,) = AI_TURN_FORMAT.unpack_from(data, offset)
+                offset += AI_TURN_FORMAT.size
+                modifications = [
+                    MODIFICATION_FORMAT.unpack_from(data, offset + i * MODIFICATION_FORMAT.size)
+                    for i in range(count)
+                ]
+                offset += count * MODIFICATION_FORMAT.size
+                yield tag, modifications
+            elif tag == TAG_GAME_END:
+                yield tag, GAME_END_FORMAT.unpack_from(data, offset)
+                offset += GAME_END_FORMAT.size
+            else:
+                raise ValueError(f"unknown replay record tag {tag:#x} at byte {offset - 1}")
+    except struct.error:
+        raise ValueError("replay log is truncated") from None
+
+
+def replay(path):
+    """Re-run every game of a replay log without a display, as fast as possible
+
+    Returns one GameReplay per game. matched is None for a game the log never
+    closed (e.g. the recording process was killed).
+    """
+    with open(path, "rb") as log_file:
+        data = log_file.read()
+
+    results = []
+    sim = None
+    seed = moves = ai_turns = 0
+    game_closed = True
+
+    def finish(matched):
+        results.append(GameReplay(seed, sim.maze_width, sim.maze_height, moves, ai_turns, sim.turn_count, matched))
+
+    for tag, payload in read_records(data):
+        if tag < 4:
+            sim.step(tag)
+            moves += 1
+        elif tag == TAG_AI_TURN:
+            # AI turns are applied from the log, never re-planned
+            if sim.pending_ai_turns:
+                sim.pending_ai_turns -= 1
+            sim.apply_ai_modifications(payload)
+            ai_turns += 1
+        elif tag == TAG_GAME:
+            if not game_closed:
+                finish(None)
+            width, height, frequency, seed = payload
+            if sim is None or (sim.maze_width, sim.maze_height, sim.ai_modify_frequency) != (width, height, frequency):
+                sim = MazeSimulation(width, height, ai_modify_frequency=frequency, defer_ai=True, seed=seed)
+            else:
+                sim.reset(seed)
+            moves = ai_turns = 0
+            game_closed = False
+        elif tag == TAG_GAME_END:
+            turn_count, checksum = payload
+            finish(turn_count == sim.turn_count and checksum == state_checksum(sim))
+            game_closed = True
+
+    if not game_closed:
+        finish(None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded MindMaze sessions headlessly")
+    parser.add_argument("logs", nargs="+", help="replay logs written with main.py --record")
+    parser.add_argument("--repeat", type=int, default=1, help="replay each log this many times (for timing)")
+    args = parser.parse_args()
+
+    mismatches = 0
+    for path in args.logs:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            results = replay(path)
+        elapsed = (time.perf_counter() - started) / args.repeat
+
+        total_moves = sum(result.moves for result in results)
+        print(f"{path}: {len(results)} games, {total_moves} moves, {elapsed * 1000:.1f} ms "
+              f"({total_moves / elapsed if elapsed > 0 else float('inf'):,.0f} moves/s)")
+        for result in results:
+            status = {True: "ok", False: "MISMATCH", None: "unfinished"}[result.matched]
+            print(f"  seed {result.seed:>20}  {result.width}x{result.height}  moves {result.moves:>6}  "
+                  f"ai turns {result.ai_turns:>5}  turns {result.turn_count:>6}  {status}")
+            mismatches += result.matched is False
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""Headless multi-session MindMaze server sharing one AI Q-table
+
+Each client connection gets its own game (maze, player and special tiles) in
+one asyncio event loop. Every session's AI learns into the same Q-table, and
+AI turns that fall due are planned in batches on a single worker thread.
+
+Messages are JSON objects, one per line, over a local TCP socket:
+
+    client -> server
+        {"op": "move", "action": "up"}      up/down/left/right
+        {"op": "state"}                     full board
+        {"op": "new_game"}
+        {"op": "hint"}                      the AI's predicted next modifications
+    server -> client
+        {"type": "state", "width", "height", "maze", "tiles", "player", "goal", "turn", "won"}
+        {"type": "move", "moved", "player", "turn", "won"}
+        {"type": "ai_turn", "cells": [[x, y, maze, tile], ...], "player"}
+        {"type": "hint", "modifications": [[x, y, value], ...]}
+        {"type": "error", "message"}
+
+maze and tiles are sent as one string of digits per row. ai_turn messages are
+pushed whenever the AI changes the board. Examples:
+
+    python server.py --port 8765
+    python server.py --clients 200 --moves 300
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from q_table import PersistentQTable, QTable
+from simulation import MazeSimulation, MOVE_UP, MOVE_DOWN, MOVE_LEFT, MOVE_RIGHT
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Action names in move messages -> simulation actions
+ACTIONS = {
+    "up": MOVE_UP,
+    "down": MOVE_DOWN,
+    "left": MOVE_LEFT,
+    "right": MOVE_RIGHT,
+}
+
+
+def encode_message(message):
+    """One JSON line, ready to write to a stream"""
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+class GameSession:
+    """One connected player and their simulation"""
+
+    def __init__(self, session_id, sim, writer):
+        self.session_id = session_id
+        self.sim = sim
+        self.writer = writer
+        self.closed = False
+
+    def send(self, message):
+        """Queue a message for the client (without waiting for it to be sent)"""
+        if not self.closed:
+            self.writer.write(encode_message(message))
+
+    def state_message(self):
+        sim = self.sim
+        return {
+            "type": "state",
+            "width": sim.maze_width,
+            "height": sim.maze_height,
+            "maze": [row.tobytes().decode("ascii") for row in sim.maze + ord("0")],
+            "tiles": [row.tobytes().decode("ascii") for row in sim.tiles + ord("0")],
+            "player": [sim.player.x, sim.player.y],
+            "goal": list(sim.goal_pos),
+            "turn": sim.turn_count,
+            "won": sim.won,
+        }
+
+
+class GameServer:
+    """Serves many concurrent games from one event loop and one shared Q-table
+
+    Sessions run their simulation with deferred AI turns, so a move only counts
+    the turns that are due. A batch task collects every session with a turn due
+    and hands them to the AI worker in one call; the worker brings each
+    session's controller up to date with its player and plans its modifications.
+    Back on the event loop the plans are applied and the changed cells pushed to
+    the clients. Controllers and the Q-table are only ever touched by the
+    worker, so sessions can keep moving while a batch is being planned, and the
+    cost of waking the worker is paid once per batch instead of once per turn.
+    The worker also flushes the Q-table every flush_interval seconds while the
+    AI is learning, so a killed server loses at most that much.
+    """
+
+    def __init__(self, maze_width=15, maze_height=15, ai_modify_frequency=3, q_table=None,
+                 max_sessions=1000, batch_delay=0.005, flush_interval=30.0):
+        self.maze_width = maze_width
+        self.maze_height = maze_height
+        self.ai_modify_frequency = ai_modify_frequency
+        self.max_sessions = max_sessions
+        self.batch_delay = batch_delay  # Seconds to let more turns join a batch
+        self.flush_interval = flush_interval  # Seconds between Q-table flushes
+        self.last_flush = time.monotonic()
+
+        # The one Q-table every session's AI reads and updates
+        if q_table is None:
+            q_table = QTable(maze_width * maze_height * 2)
+        self.q_table = q_table
+
+        self.sessions = {}
+        self.next_session_id = 1
+
+        # Sessions with an AI turn due, in the order they became due
+        self.ai_due = {}
+        self.ai_wakeup = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-batch")
+        self.server = None
+        self.batch_task = None
+
+        # Counters for load reports
+        self.ai_batches = 0
+        self.ai_turns = 0
+        self.ai_seconds = 0.0
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start listening; returns the bound (host, port)"""
+        self.ai_wakeup = asyncio.Event()
+        self.batch_task = asyncio.create_task(self._batch_loop())
+        self.server = await asyncio.start_server(self._handle_client, host, port, backlog=self.max_sessions)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        """Stop accepting clients, finish the AI work in flight and flush the Q-table"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batch_task is not None:
+            self.batch_task.cancel()
+            try:
+                await self.batch_task
+            except asyncio.CancelledError:
+                pass
+        for session in list(self.sessions.values()):
+            session.closed = True
+            session.writer.close()
+        self.executor.shutdown(wait=True)
+        self.q_table.flush()
+
+    def open_session(self, writer):
+        """Create a session with a fresh game"""
+        sim = MazeSimulation(
+            self.maze_width, self.maze_height, ai_modify_frequency=self.ai_modify_frequency,
+            q_table=self.q_table, defer_ai=True
+        )
+        session = GameSession(self.next_session_id, sim, writer)
+        self.next_session_id += 1
+        self.sessions[session.session_id] = session
+        return session
+
+    def close_session(self, session):
+        session.closed = True
+        self.sessions.pop(session.session_id, None)
+        self.ai_due.pop(session.session_id, None)
+
+    async def _handle_client(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(encode_message({"type": "error", "message": "server is full"}))
+            writer.close()
+            return
+
+        session = self.open_session(writer)
+        session.send(session.state_message())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    reply = await self.handle_request(session, request)
+                except KeyError as e:
+                    reply = {"type": "error", "message": f"missing field {e}"}
+                except (ValueError, TypeError) as e:
+                    reply = {"type": "error", "message": str(e)}
+                session.send(reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.close_session(session)
+            writer.close()
+
+    async def handle_request(self, session, request):
+        """Carry out one client request and return the reply"""
+        sim = session.sim
+        op = request["op"]
+
+        if op == "move":
+            action = ACTIONS.get(request["action"])
+            if action is None:
+                raise ValueError(f"unknown action {request['action']!r}")
+            if sim.won:
+                return {"type": "move", "moved": False, "player": [sim.player.x, sim.player.y],
+                        "turn": sim.turn_count, "won": True}
+            result = sim.step(action)
+            if result.ai_turn and not sim.won:
+                self._schedule_ai(session)
+            return {"type": "move", "moved": result.moved, "player": [sim.player.x, sim.player.y],
+                    "turn": sim.turn_count, "won": result.won}
+
+        if op == "state":
+            return session.state_message()
+
+        if op == "new_game":
+            # Any plan in flight is for the old controller and gets dropped
+            sim.reset()
+            self.ai_due.pop(session.session_id, None)
+            return session.state_message()
+
+        if op == "hint":
+            controller = sim.ai_controller
+            position = sim.player.get_position()
+            modifications = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._predict, controller, position
+            )
+            return {"type": "hint", "modifications": [list(action) for action in modifications]}
+
+        raise ValueError(f"unknown op {op!r}")
+
+    def _schedule_ai(self, session):
+        """Queue a session whose AI turn just fell due"""
+        self.ai_due[session.session_id] = session
+        self.ai_wakeup.set()
+
+    async def _batch_loop(self):
+        """Plan and apply AI turns for every session that has one due, batch by batch"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.ai_wakeup.wait()
+            if self.batch_delay:
+                await asyncio.sleep(self.batch_delay)
+            self.ai_wakeup.clear()
+
+            batch = list(self.ai_due.values())
+            self.ai_due = {}
+            jobs = [(session.sim.ai_controller, session.sim.player.get_position()) for session in batch]
+
+            started = time.perf_counter()
+            plans = await loop.run_in_executor(self.executor, self._plan_batch, jobs)
+            self.ai_seconds += time.perf_counter() - started
+            self.ai_batches += 1
+
+            syncs = []
+            for session, (controller, _), modifications in zip(batch, jobs, plans):
+                sim = session.sim
+                # Skip sessions that left or started a new game while we planned
+                if session.closed or sim.ai_controller is not controller or sim.won:
+                    continue
+
+                sim.pending_ai_turns -= 1
+                sim.apply_ai_modifications(modifications)
+                self.ai_turns += 1
+                syncs.append((controller, sim.pop_maze_changes()))
+
+                cells = [[x, y, int(sim.maze[y, x]), int(sim.tiles[y, x])] for x, y in sim.pop_changed_cells()]
+                session.send({"type": "ai_turn", "cells": cells, "player": [sim.player.x, sim.player.y]})
+                if sim.pending_ai_turns:
+                    self.ai_due[session.session_id] = session
+
+            # Let each AI see the maze it actually got, ahead of its next plan
+            if syncs:
+                self.executor.submit(self._sync_mazes, syncs)
+
+            # Persist what the AI learned at a safe point between batches
+            if time.monotonic() - self.last_flush >= self.flush_interval:
+                self.last_flush = time.monotonic()
+                self.executor.submit(self.q_table.flush)
+            if self.ai_due:
+                self.ai_wakeup.set()
+
+    def _plan_batch(self, jobs):
+        """Worker side of a batch: plan one modification set per (controller, player position)"""
+        plans = []
+        for controller, (x, y) in jobs:
+            if (controller.player_x, controller.player_y) != (x, y):
+                controller.set_player_position(x, y)
+            plans.append(controller.get_maze_modifications())
+        return plans
+
+    def _sync_mazes(self, syncs):
+        """Worker side: hand each controller the cells its plan changed"""
+        for controller, changes in syncs:
+            controller.sync_cells(changes)
+
+    def _predict(self, controller, position):
+        """Worker side of a hint"""
+        if (controller.player_x, controller.player_y) != position:
+            controller.set_player_position(*position)
+        return controller.get_modification_prediction()
+
+
+class GameClient:
+    """Minimal asyncio client for the server, used by the load test"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.state = None
+        self.ai_turns = 0
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer)
+        client.state = await client.receive("state")
+        return client
+
+    async def request(self, message, reply_type):
+        self.writer.write(encode_message(message))
+        await self.writer.drain()
+        return await self.receive(reply_type)
+
+    async def receive(self, reply_type):
+        """Read messages until one of reply_type arrives, counting pushed AI turns on the way"""
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                raise ConnectionError("server closed the connection")
+            message = json.loads(line)
+            if message["type"] == reply_type:
+                return message
+            if message["type"] == "ai_turn":
+                self.ai_turns += 1
+            elif message["type"] == "error":
+                raise RuntimeError(message["message"])
+
+    async def move(self, action):
+        return await self.request({"op": "move", "action": action}, "move")
+
+    async def new_game(self):
+        self.state = await self.request({"op": "new_game"}, "state")
+        return self.state
+
+    async def hint(self):
+        return (await self.request({"op": "hint"}, "hint"))["modifications"]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def run_load_test(server, host, port, clients, moves):
+    """Play `moves` random moves on each of `clients` connections and report throughput"""
+    async def play():
+        client = await GameClient.connect(host, port)
+        actions = list(ACTIONS)
+        for _ in range(moves):
+            reply = await client.move(random.choice(actions))
+            if reply["won"]:
+                await client.new_game()
+        await client.close()
+        return client.ai_turns
+
+    started = time.perf_counter()
+    pushed = await asyncio.gather(*(play() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    total_moves = clients * moves
+    print(f"{clients} clients, {total_moves} moves in {elapsed:.2f} s ({total_moves / elapsed:,.0f} moves/s)")
+    if server.ai_batches:
+        print(f"{server.ai_turns} AI turns in {server.ai_batches} batches "
+              f"(mean batch {server.ai_turns / server.ai_batches:.1f}, "
+              f"{server.ai_seconds * 1000 / max(1, server.ai_turns):.3f} ms per turn), "
+              f"{sum(pushed)} pushed to clients, Q-table rows {len(server.q_table)}")
+
+
+async def serve(args):
+    q_table = None
+    if args.q_table:
+        q_table = PersistentQTable(args.q_table, args.size * args.size * 2, args.size, args.size)
+    server = GameServer(args.size, args.size, q_table=q_table, max_sessions=args.max_sessions,
+                        batch_delay=args.batch_delay, flush_interval=args.flush_interval)
+
+    if args.clients:
+        # Load test against a private server on a free port
+        host, port = await server.start(args.host, 0)
+        try:
+            await run_load_test(server, host, port, args.clients, args.moves)
+        finally:
+            await server.stop()
+        return
+
+    host, port = await server.start(args.host, args.port)
+    print(f"Serving MindMaze on {host}:{port}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-session MindMaze server")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--size", type=int, default=15, help="board width and height")
+    parser.add_argument("--q-table", help="directory of a persistent Q-table to share (in memory if omitted)")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="most concurrent games")
+    parser.add_argument("--batch-delay", type=float, default=0.005,
+                        help="seconds to gather AI turns into one batch")
+    parser.add_argument("--flush-interval", type=float, default=30.0,
+                        help="seconds between flushes of a persistent Q-table")
+    parser.add_argument("--clients", type=int, default=0, help="run a load test with this many local clients")
+    parser.add_argument("--moves", type=int, default=300, help="moves per load-test client")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
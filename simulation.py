@@ -0,0 +1,419 @@
+import random
+from collections import namedtuple
+
+import numpy as np
+
+from ai_controller import AIController
+from free_cells import FreeCellIndex, NoFreeCellsError
+from maze_generator import MazeGenerator
+from player import Player
+from profiling import FrameProfiler
+from reachability import ReachabilityTracker
+
+# Player actions for MazeSimulation.step
+MOVE_UP = 0
+MOVE_DOWN = 1
+MOVE_LEFT = 2
+MOVE_RIGHT = 3
+ACTION_DELTAS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+# Special tile types in MazeSimulation.tiles
+TILE_NONE = 0
+TILE_TRAP = 1
+TILE_TELEPORTER = 2
+TILE_SHORTCUT = 3
+
+# Outcome of one step: did the player move, did the AI take a turn, was the goal reached
+StepResult = namedtuple("StepResult", ["moved", "ai_turn", "won"])
+
+
+class MazeSimulation:
+    """Display-free game rules: movement, special tiles and AI maze edits
+
+    MindMazeGame drives this for interactive play; it imports without pygame so it
+    can also run thousands of games for training and load tests.
+    """
+
+    def __init__(self, maze_width=15, maze_height=15, ai_modify_frequency=3, q_table=None, defer_ai=False,
+                 profiler=None, rng=None, seed=None, recorder=None):
+        self.maze_width = maze_width
+        self.maze_height = maze_height
+        self.ai_modify_frequency = ai_modify_frequency  # AI modifies maze every few turns
+        self.q_table = q_table
+
+        # With deferred AI, step() only counts the AI turns that are due and never
+        # touches the AI controller; an AIPlanner plans and applies them instead
+        self.defer_ai = defer_ai
+
+        # Phase timers for the AI turn; a disabled profiler costs next to nothing
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+
+        # Each game runs from its own seed, drawn from rng (global random by default)
+        # unless reset() is given one. The game's rules and maze share one stream;
+        # the AI gets a separate stream, so AI turns planned on another thread
+        # never shift the rules' random draws.
+        self.seed_rng = rng if rng is not None else random
+        self.seed = None
+        self.rng = None
+
+        # Optional ReplayRecorder that logs seeds, moves and AI turns
+        self.recorder = recorder
+
+        self.maze_generator = MazeGenerator(maze_width, maze_height)
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """Start a new game on a freshly generated maze; the same seed replays the same game"""
+        # Close the previous game in the replay log
+        if self.recorder is not None and self.rng is not None:
+            self.recorder.end_game(self)
+
+        self.seed = seed if seed is not None else self.seed_rng.getrandbits(64)
+        self.rng = random.Random(self.seed)
+        ai_rng = random.Random(self.rng.getrandbits(64))
+
+        # Generate initial maze
+        self.maze_generator.rng = self.rng
+        self.maze = self.maze_generator.generate("uint8")
+
+        # Set start position (top-left) and goal position (center)
+        self.start_pos = (0, 0)
+        self.goal_pos = (self.maze_width // 2, self.maze_height // 2)
+
+        # Create player and place at start position
+        self.player = Player(self.start_pos[0], self.start_pos[1])
+
+        # Reset turn count
+        self.turn_count = 0
+        self.won = False
+        self.pending_ai_turns = 0
+
+        # Cells whose wall/path state or special tile changed since the last
+        # pop_changed_cells() call, so a renderer can redraw just those
+        self.changed_cells = set()
+
+        # Cells whose wall/path state changed since the last pop_maze_changes()
+        # call, so the AI can sync just those into its own copy of the maze
+        self.maze_changes = set()
+
+        # Special tiles: the lists keep placement order, the grid and partner map
+        # answer "what is at (x, y)" in O(1)
+        self.traps = []
+        self.teleporters = []
+        self.shortcuts = []
+        self.tiles = np.zeros((self.maze_height, self.maze_width), dtype=np.uint8)
+        self.teleporter_partner = {}
+
+        # Open cells that are not start, goal or a special tile, for O(1) tile placement
+        free = self.maze == 1
+        free[self.start_pos[1], self.start_pos[0]] = False
+        free[self.goal_pos[1], self.goal_pos[0]] = False
+        self.free_cells = FreeCellIndex(free, rng=self.rng)
+
+        # Place initial traps and teleporters
+        self.place_special_tiles()
+
+        # Track whether the goal stays reachable as the AI edits the maze
+        self.reachability = ReachabilityTracker(self.maze, self.start_pos, self.goal_pos)
+
+        # Initialize AI with the maze, keeping what it learned in earlier games
+        self.ai_controller = AIController(self.maze_width, self.maze_height, self.q_table, rng=ai_rng)
+        self.ai_controller.set_maze(self.maze)
+        self.ai_controller.set_player_position(self.player.x, self.player.y)
+
+        if self.recorder is not None:
+            self.recorder.start_game(self)
+
+    def step(self, action):
+        """Apply one player action (MOVE_UP/DOWN/LEFT/RIGHT) and the rules that follow"""
+        if self.recorder is not None:
+            self.recorder.record_move(action)
+
+        dx, dy = ACTION_DELTAS[action]
+        player = self.player
+
+        # Store previous position
+        prev_x, prev_y = player.x, player.y
+
+        if not self.can_move(prev_x + dx, prev_y + dy):
+            return StepResult(False, False, self.won)
+
+        player.move(dx, dy)
+        self.turn_count += 1
+
+        # Check for teleporter
+        self.check_teleporter()
+
+        # Check for trap
+        if self.check_trap():
+            # Player hit trap, move back
+            player.x, player.y = prev_x, prev_y
+
+        # Check for shortcut
+        self.check_shortcut()
+
+        # Check for goal
+        if (player.x, player.y) == self.goal_pos:
+            self.won = True
+
+        # Keep the reachability witness anchored at the player
+        self.reachability.move_source(player.x, player.y)
+
+        # Update AI with new player position
+        if not self.defer_ai:
+            self.ai_controller.set_player_position(player.x, player.y)
+
+        # AI modifies maze every few turns
+        ai_turn = self.turn_count % self.ai_modify_frequency == 0
+        if ai_turn:
+            if self.defer_ai:
+                self.pending_ai_turns += 1
+            else:
+                self.ai_modify_maze()
+
+        return StepResult(True, ai_turn, self.won)
+
+    def pop_changed_cells(self):
+        """Return the cells changed since the last call and start a new set"""
+        changed = self.changed_cells
+        self.changed_cells = set()
+        return changed
+
+    def pop_maze_changes(self):
+        """Return (x, y, value) for the maze cells changed since the last call"""
+        changes = [(x, y, int(self.maze[y, x])) for x, y in self.maze_changes]
+        self.maze_changes = set()
+        return changes
+
+    def place_special_tiles(self):
+        # Clear existing special tiles
+        for pos in self.traps + self.shortcuts + [pos for pair in self.teleporters for pos in pair]:
+            self.remove_tile(pos)
+        self.traps = []
+        self.teleporters = []
+        self.shortcuts = []
+
+        # 3 traps, 2 teleporter pairs and 2 shortcuts, on distinct free cells
+        positions = iter(self.get_random_valid_positions(3 + 2 * 2 + 2))
+
+        # Place traps (3 traps)
+        for _ in range(3):
+            self.traps.append(self.place_tile(TILE_TRAP, next(positions)))
+
+        # Place teleporters (2 pairs)
+        for _ in range(2):
+            self.teleporters.append(self.place_teleporter_pair(next(positions), next(positions)))
+
+        # Place shortcuts (2)
+        for _ in range(2):
+            self.shortcuts.append(self.place_tile(TILE_SHORTCUT, next(positions)))
+
+    def place_tile(self, tile, pos):
+        """Put a tile of the given type on a free cell and return its position"""
+        x, y = pos
+        self.tiles[y, x] = tile
+        self.free_cells.discard(x, y)
+        return pos
+
+    def place_teleporter_pair(self, first, second):
+        """Put two linked teleporters on free cells and return their positions"""
+        self.place_tile(TILE_TELEPORTER, first)
+        self.place_tile(TILE_TELEPORTER, second)
+        self.teleporter_partner[first] = second
+        self.teleporter_partner[second] = first
+        return first, second
+
+    def remove_tile(self, pos):
+        """Clear the special tile at pos"""
+        x, y = pos
+        self.tiles[y, x] = TILE_NONE
+        self.teleporter_partner.pop(pos, None)
+        self.refresh_free_cell(x, y)
+
+    def refresh_free_cell(self, x, y):
+        """Re-check whether (x, y) can take a special tile after it changed"""
+        if (self.maze[y, x] == 1 and self.tiles[y, x] == TILE_NONE and
+                (x, y) != self.start_pos and (x, y) != self.goal_pos):
+            self.free_cells.add(x, y)
+        else:
+            self.free_cells.discard(x, y)
+
+    def get_random_valid_position(self):
+        """Pick a random open cell that is not start, goal, the player or a special tile"""
+        return self.get_random_valid_positions(1)[0]
+
+    def get_random_valid_positions(self, k):
+        """Pick k distinct random free cells; raises NoFreeCellsError if there are fewer"""
+        # The player's cell is only held back while sampling, so moves cost nothing
+        player_x, player_y = self.player.x, self.player.y
+        player_cell_free = (player_x, player_y) in self.free_cells
+        if player_cell_free:
+            self.free_cells.discard(player_x, player_y)
+        try:
+            return self.free_cells.sample_distinct(k)
+        finally:
+            if player_cell_free:
+                self.free_cells.add(player_x, player_y)
+
+    def can_move(self, x, y):
+        # Check if position is within maze bounds
+        if x < 0 or x >= self.maze_width or y < 0 or y >= self.maze_height:
+            return False
+
+        # Check if there's a path in the maze
+        return self.maze[y, x] == 1  # 1 represents a path
+
+    def check_teleporter(self):
+        partner = self.teleporter_partner.get((self.player.x, self.player.y))
+        if partner is not None:
+            self.player.x, self.player.y = partner
+
+    def check_trap(self):
+        return self.tiles[self.player.y, self.player.x] == TILE_TRAP
+
+    def check_shortcut(self):
+        if self.tiles[self.player.y, self.player.x] == TILE_SHORTCUT:
+            # Move player closer to goal
+            goal_x, goal_y = self.goal_pos
+            dx = goal_x - self.player.x
+            dy = goal_y - self.player.y
+
+            # Move in the direction of the goal by up to 3 cells
+            steps = min(3, abs(dx) + abs(dy))
+
+            for _ in range(steps):
+                # Determine direction with highest priority
+                if abs(dx) > abs(dy):
+                    # Move horizontally
+                    step_x = 1 if dx > 0 else -1
+                    if self.can_move(self.player.x + step_x, self.player.y):
+                        self.player.x += step_x
+                        dx -= step_x
+                    else:
+                        # Try vertical if horizontal is blocked
+                        step_y = 1 if dy > 0 else -1
+                        if self.can_move(self.player.x, self.player.y + step_y):
+                            self.player.y += step_y
+                            dy -= step_y
+                        else:
+                            break  # If both directions are blocked, stop moving
+                else:
+                    # Move vertically
+                    step_y = 1 if dy > 0 else -1
+                    if self.can_move(self.player.x, self.player.y + step_y):
+                        self.player.y += step_y
+                        dy -= step_y
+                    else:
+                        # Try horizontal if vertical is blocked
+                        step_x = 1 if dx > 0 else -1
+                        if self.can_move(self.player.x + step_x, self.player.y):
+                            self.player.x += step_x
+                            dx -= step_x
+                        else:
+                            break
+
+    def ai_modify_maze(self):
+        with self.profiler.phase("ai_modify_maze"):
+            # Let AI modify the maze
+            with self.profiler.phase("get_maze_modifications"):
+                modifications = self.ai_controller.get_maze_modifications()
+            self.apply_ai_modifications(modifications)
+
+            # Let the AI see the maze it actually got
+            self.ai_controller.sync_cells(self.pop_maze_changes())
+
+    def apply_ai_modifications(self, modifications):
+        """Apply one AI turn's (x, y, value) flips, keep the goal reachable and move tiles
+
+        Flips are checked against the current state, so a plan made a few moves
+        earlier is still safe to apply.
+        """
+        if self.recorder is not None:
+            self.recorder.record_ai_turn(modifications)
+
+        # Apply modifications
+        for x, y, value in modifications:
+            if 0 <= x < self.maze_width and 0 <= y < self.maze_height:
+                # Don't modify start, goal, or player position
+                if ((x, y) != self.start_pos and
+                    (x, y) != self.goal_pos and
+                    (x, y) != (self.player.x, self.player.y)):
+                    # Rejected if the wall would cut the player off from the goal
+                    if self.reachability.set_cell(x, y, value):
+                        self.changed_cells.add((x, y))
+                        self.maze_changes.add((x, y))
+                        self.refresh_free_cell(x, y)
+
+        # Ensure there's always a path to the goal
+        self.ensure_path_to_goal()
+
+        # Update special tiles
+        self.update_special_tiles()
+
+    def ensure_path_to_goal(self):
+        # The reachability tracker refuses flips that would cut the route, so this
+        # only has work to do if the path was broken some other way
+        with self.profiler.phase("ensure_path_to_goal"):
+            if not self.reachability.is_reachable():
+                for x, y in self.reachability.repair():
+                    self.changed_cells.add((x, y))
+                    self.maze_changes.add((x, y))
+                    self.refresh_free_cell(x, y)
+
+    def update_special_tiles(self):
+        # Decide which tiles move this turn
+        moving_traps = []
+        moving_teleporters = []
+        moving_shortcuts = []
+
+        # Occasionally move traps based on player position
+        if self.rng.random() < 0.3:  # 30% chance to move traps
+            for i in range(len(self.traps)):
+                if self.rng.random() < 0.5:  # 50% chance for each trap
+                    moving_traps.append(i)
+
+        # Occasionally move teleporters
+        if self.rng.random() < 0.2:  # 20% chance to move teleporters
+            for i in range(len(self.teleporters)):
+                if self.rng.random() < 0.3:  # 30% chance for each teleporter pair
+                    moving_teleporters.append(i)
+
+        # Occasionally move shortcuts
+        if self.rng.random() < 0.25:  # 25% chance to move shortcuts
+            for i in range(len(self.shortcuts)):
+                if self.rng.random() < 0.4:  # 40% chance for each shortcut
+                    moving_shortcuts.append(i)
+
+        count = len(moving_traps) + 2 * len(moving_teleporters) + len(moving_shortcuts)
+        if count == 0:
+            return
+
+        # Sample every new cell while the old tiles are still down, so no tile
+        # lands on its own old cell or on another moving tile
+        try:
+            positions = iter(self.get_random_valid_positions(count))
+        except NoFreeCellsError:
+            # The board is too full to move anything this turn
+            return
+
+        for i in moving_traps:
+            old_pos = self.traps[i]
+            self.traps[i] = self.place_tile(TILE_TRAP, next(positions))
+            self.remove_tile(old_pos)
+            self.changed_cells.add(old_pos)
+            self.changed_cells.add(self.traps[i])
+
+        for i in moving_teleporters:
+            old_pair = self.teleporters[i]
+            self.teleporters[i] = self.place_teleporter_pair(next(positions), next(positions))
+            for pos in old_pair:
+                self.remove_tile(pos)
+            self.changed_cells.update(old_pair)
+            self.changed_cells.update(self.teleporters[i])
+
+        for i in moving_shortcuts:
+            old_pos = self.shortcuts[i]
+            self.shortcuts[i] = self.place_tile(TILE_SHORTCUT, next(positions))
+            self.remove_tile(old_pos)
+            self.changed_cells.add(old_pos)
+            self.changed_cells.add(self.shortcuts[i])
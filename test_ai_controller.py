@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+from ai_controller import AIController, top_k_actions
+
+
+def make_controller(width, height):
+    controller = AIController(width, height, rng=random.Random(0))
+    controller.set_maze(np.ones((height, width), dtype=np.uint8))
+    controller.set_player_position(0, 0)
+    return controller
+
+
+def blocked_cells(controller):
+    return {(controller.player_x, controller.player_y), (controller.goal_x, controller.goal_y)}
+
+
+def test_prediction_skips_player_and_goal_on_tiny_boards():
+    for width, height in [(2, 2), (3, 1), (1, 2)]:
+        controller = make_controller(width, height)
+        state = controller._get_state()
+        num_valid = int(np.count_nonzero(controller.valid_mask))
+
+        # Unseen state, then a seen one whose masked actions hold the best values
+        predictions = controller.get_modification_prediction()
+        assert len(predictions) == min(5, num_valid)
+        assert not {(x, y) for x, y, _ in predictions} & blocked_cells(controller)
+
+        for action_id in range(controller.num_actions):
+            controller.q_table.set(state, action_id, 1.0 if controller.valid_mask[action_id] else 9.0)
+        predictions = controller.get_modification_prediction()
+        assert len(predictions) == min(5, num_valid)
+        assert not {(x, y) for x, y, _ in predictions} & blocked_cells(controller)
+
+
+def test_top_k_matches_stable_argsort():
+    rng = np.random.default_rng(1)
+    for _ in range(500):
+        q_values = rng.integers(-3, 4, rng.integers(1, 40)).astype(np.float32)
+        k = int(rng.integers(0, 8))
+        expected = np.argsort(-q_values, kind='stable')[:k]
+        assert top_k_actions(q_values, k).tolist() == expected.tolist()
+
+
+def test_prediction_cache_follows_q_updates():
+    controller = make_controller(15, 15)
+    state = controller._get_state()
+    first = controller.get_modification_prediction()
+    assert controller.get_modification_prediction() == first
+
+    action_id = controller._action_id(7, 3, 0)
+    controller.q_table.set(state, action_id, 5.0)
+    assert controller.get_modification_prediction()[0] == (7, 3, 0)
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from batch_env import BatchMazeEnv
+from simulation import MazeSimulation
+
+
+def freeze_tiles(sim):
+    # Tile moves draw from different random streams in the two implementations
+    sim.update_special_tiles = lambda: None
+    return sim
+
+
+def random_modifications(rng, sims, size, k=5):
+    """2-5 flips per board, biased towards the player so cuts and detours happen"""
+    mods = np.full((len(sims), k, 3), -1)
+    for i, sim in enumerate(sims):
+        for j in range(rng.randint(2, k)):
+            if rng.random() < 0.6:
+                x, y = sim.player.x + rng.randint(-3, 3), sim.player.y + rng.randint(-3, 3)
+            else:
+                x, y = rng.randrange(size), rng.randrange(size)
+            mods[i, j] = (x, y, 0 if rng.random() < 0.7 else 1)
+    return mods
+
+
+def test_batch_env_matches_simulation():
+    rng = random.Random(5)
+    for size in (9, 15):
+        n = 16
+        sims = [freeze_tiles(MazeSimulation(size, size, defer_ai=True, seed=i)) for i in range(n)]
+        env = BatchMazeEnv(n, size, size, seed=1, auto_reset=False)
+        env.update_special_tiles = lambda envs: None
+        for i, sim in enumerate(sims):
+            env.load_simulation(i, sim)
+
+        for _ in range(300):
+            actions = np.array([rng.randrange(4) for _ in range(n)])
+            mods = random_modifications(rng, sims, size)
+            result = env.step(actions, mods)
+
+            for i, sim in enumerate(sims):
+                step = sim.step(int(actions[i]))
+                assert (step.moved, step.ai_turn, step.won) == (result.moved[i], result.ai_turn[i], result.won[i])
+                if step.ai_turn:
+                    sim.pending_ai_turns -= 1
+                    sim.apply_ai_modifications([tuple(int(v) for v in row) for row in mods[i] if row[0] != -1])
+
+                assert (sim.maze == env.mazes[i]).all()
+                assert (sim.tiles == env.tiles[i]).all()
+                assert (sim.player.x, sim.player.y) == (env.player_x[i], env.player_y[i])
+                assert sim.turn_count == env.turn_count[i]
+                assert sim.reachability.is_reachable() == env.connected[i]
+                if sim.won:
+                    sim.reset(rng.getrandbits(32))
+                    freeze_tiles(sim)
+                    env.load_simulation(i, sim)
+
+            codes = env.encode_states()
+            for i, sim in enumerate(sims):
+                assert sim.ai_controller._encode_state(sim.maze, sim.player.x, sim.player.y) == codes[i]
@@ -0,0 +1,88 @@
+import random
+from collections import deque
+
+import numpy as np
+
+from ai_controller import AIController
+from distance_field import DistanceField, UNREACHABLE
+from maze_generator import MazeGenerator
+
+
+def bfs_distances(maze, goal):
+    """From-scratch BFS distance of every open cell to the goal"""
+    height, width = maze.shape
+    dist = np.full(maze.shape, UNREACHABLE, dtype=np.int32)
+    goal_x, goal_y = goal
+    if maze[goal_y, goal_x] != 1:
+        return dist
+    dist[goal_y, goal_x] = 0
+    queue = deque([goal])
+    while queue:
+        x, y = queue.popleft()
+        for dx, dy in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and maze[ny, nx] == 1 and dist[ny, nx] == UNREACHABLE:
+                dist[ny, nx] = dist[y, x] + 1
+                queue.append((nx, ny))
+    return dist
+
+
+def check_route(field, maze, x, y):
+    route = field.route_from(x, y)
+    if field.distance(x, y) == UNREACHABLE:
+        assert route == []
+        return
+    assert len(route) == field.distance(x, y) + 1
+    assert route[0] == (x, y) and route[-1] == field.goal
+    for a, b in zip(route, route[1:]):
+        assert abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1
+        assert maze[b[1], b[0]] == 1
+
+
+def test_field_matches_bfs_over_random_flips():
+    rng = random.Random(2)
+    size = 13
+    goal = (size // 2, size // 2)
+    for seed in range(20):
+        maze = MazeGenerator(size, size, rng=random.Random(seed)).generate("uint8")
+        field = DistanceField(maze, goal)
+        for _ in range(300):
+            x, y = rng.randrange(size), rng.randrange(size)
+            value = rng.randrange(2)
+            maze[y, x] = value
+            field.set_cell(x, y, value)
+            assert (field.dist == bfs_distances(maze, goal)).all()
+            check_route(field, maze, rng.randrange(size), rng.randrange(size))
+
+
+def test_trial_flips_roll_back_in_any_order():
+    # The AI tries out a few flips on the field and undoes them from an overlay
+    rng = random.Random(3)
+    size = 15
+    goal = (size // 2, size // 2)
+    maze = MazeGenerator(size, size, rng=random.Random(9)).generate("uint8")
+    field = DistanceField(maze, goal)
+    expected = bfs_distances(maze, goal)
+    for _ in range(200):
+        trial_cells = {}
+        for _ in range(rng.randint(2, 5)):
+            x, y = rng.randrange(size), rng.randrange(size)
+            trial_cells.setdefault((x, y), maze[y, x])
+            field.set_cell(x, y, rng.randrange(2))
+        cells = list(trial_cells.items())
+        rng.shuffle(cells)
+        for (x, y), value in cells:
+            field.set_cell(x, y, value)
+        assert (field.dist == expected).all()
+        assert (field.open == (maze == 1)).all()
+
+
+def test_planning_leaves_the_field_on_the_real_maze():
+    size = 15
+    maze = MazeGenerator(size, size, rng=random.Random(5)).generate("uint8")
+    controller = AIController(size, size, rng=random.Random(6))
+    controller.set_maze(maze)
+    controller.set_player_position(0, 0)
+    for _ in range(100):
+        controller.get_maze_modifications()
+        assert (controller.distance_field.dist == bfs_distances(controller.maze, controller.distance_field.goal)).all()
@@ -0,0 +1,80 @@
+import random
+from collections import deque
+
+from maze_generator import MazeGenerator
+from reachability import NEIGHBOR_OFFSETS, ReachabilityTracker
+
+
+def reaches(maze, source, target):
+    """From-scratch BFS; the player's own cell counts as open even if walled"""
+    height, width = maze.shape
+    seen = {source}
+    queue = deque([source])
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == target:
+            return True
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height and (nx, ny) not in seen and maze[ny, nx] == 1:
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return False
+
+
+def check_witness(tracker, maze):
+    path = tracker.path
+    assert path[0] == tracker.target and path[-1] == tracker.source
+    for a, b in zip(path, path[1:]):
+        assert abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1
+    for x, y in path[:-1]:
+        assert maze[y, x] == 1
+    assert tracker.index == {cell: i for i, cell in enumerate(path)}
+
+
+def test_tracker_matches_bfs_over_random_flips_and_moves():
+    rng = random.Random(4)
+    size = 11
+    for seed in range(40):
+        maze = MazeGenerator(size, size, rng=random.Random(seed)).generate("uint8")
+        target = (size // 2, size // 2)
+        tracker = ReachabilityTracker(maze, (0, 0), target)
+
+        for _ in range(400):
+            source = tracker.source
+            if rng.random() < 0.3:
+                # Walk to an open neighbour, or now and then teleport anywhere,
+                # walled-in cells included
+                if rng.random() < 0.1:
+                    x, y = rng.randrange(size), rng.randrange(size)
+                else:
+                    dx, dy = rng.choice(NEIGHBOR_OFFSETS)
+                    x, y = source[0] + dx, source[1] + dy
+                    if not (0 <= x < size and 0 <= y < size and maze[y, x] == 1):
+                        continue
+                tracker.move_source(x, y)
+            else:
+                x, y = rng.randrange(size), rng.randrange(size)
+                value = 0 if rng.random() < 0.7 else 1
+                was_open = maze[y, x] == 1
+                was_reachable = tracker.is_reachable()
+                trial = maze.copy()
+                trial[y, x] = value
+                expected = reaches(trial, source, target)
+                accepted = tracker.set_cell(x, y, value)
+
+                if value == 0 and was_open and was_reachable:
+                    # A wall on an open cell is refused exactly when it would cut the goal off
+                    if (x, y) in (source, target):
+                        assert not accepted
+                    else:
+                        assert accepted == expected
+                else:
+                    assert accepted
+
+            assert tracker.is_reachable() == reaches(maze, tracker.source, target)
+            if not tracker.is_reachable():
+                opened = tracker.repair()
+                assert opened and all(maze[y, x] == 1 for x, y in opened)
+                assert reaches(maze, tracker.source, target)
+            check_witness(tracker, maze)
@@ -0,0 +1,207 @@
+"""Offline self-play trainer for the maze-modifying AI
+
+Worker processes each run their own MazeSimulation and AIController against
+scripted or random players, learning into a local Q-table. Every round they
+send the parent the entries they updated (how far each moved and how many
+updates moved it); the parent merges them into one table by visit-weighted
+averaging and sends the merged entries back, so every worker starts the next
+round from the same table. Examples:
+
+    python trainer.py --workers 8 --rounds 50 --games 20
+    python trainer.py --q-table q_table --player greedy
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from distance_field import UNREACHABLE
+from q_table import PersistentQTable, QTable, VisitCountingQTable
+from simulation import ACTION_DELTAS, MazeSimulation
+
+PLAYERS = ("random", "greedy")
+
+
+def choose_move(sim, player, epsilon, rng):
+    """Pick a move for a scripted player
+
+    "random" walks at random. "greedy" steps towards the goal along the AI's
+    own distance field, taking a random move with chance epsilon.
+    """
+    if player == "random" or rng.random() < epsilon:
+        return rng.randrange(len(ACTION_DELTAS))
+
+    field = sim.ai_controller.distance_field
+    x, y = sim.player.x, sim.player.y
+    best_action = None
+    best_dist = None
+    for action, (dx, dy) in enumerate(ACTION_DELTAS):
+        if sim.can_move(x + dx, y + dy):
+            dist = field.distance(x + dx, y + dy)
+            if dist != UNREACHABLE and (best_dist is None or dist < best_dist):
+                best_action, best_dist = action, dist
+    if best_action is None:
+        return rng.randrange(len(ACTION_DELTAS))
+    return best_action
+
+
+def _worker_main(conn, worker_id, seed, maze_size, ai_modify_frequency, player, epsilon, max_moves):
+    """Worker process: play the games asked for each round and send back the Q deltas"""
+    rng = random.Random(seed)
+    table = VisitCountingQTable(maze_size * maze_size * 2)
+    sim = MazeSimulation(maze_size, maze_size, ai_modify_frequency=ai_modify_frequency, q_table=table, rng=rng)
+
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        games, merged = message
+        if merged is not None:
+            table.load(*merged)
+
+        started = time.perf_counter()
+        moves = wins = 0
+        for _ in range(games):
+            sim.reset()
+            for _ in range(max_moves):
+                sim.step(choose_move(sim, player, epsilon, rng))
+                moves += 1
+                if sim.won:
+                    wins += 1
+                    break
+        stats = {"worker": worker_id, "games": games, "moves": moves, "wins": wins,
+                 "seconds": time.perf_counter() - started}
+        conn.send((table.drain_deltas(), stats))
+
+    conn.close()
+
+
+def merge_deltas(table, deltas):
+    """Fold the workers' (states, actions, deltas, visits) into table
+
+    Each entry moves by the visit-weighted average of the workers' deltas for
+    it. Returns the merged entries as (states, actions, values) for the workers.
+    """
+    states = np.concatenate([d[0] for d in deltas])
+    actions = np.concatenate([d[1] for d in deltas]).astype(np.int64)
+    changes = np.concatenate([d[2] for d in deltas]).astype(np.float64)
+    visits = np.concatenate([d[3] for d in deltas]).astype(np.float64)
+    if len(states) == 0:
+        return states, actions, np.zeros(0, dtype=table.dtype)
+
+    unique_states, state_index = np.unique(states, return_inverse=True)
+    row_ids = np.array([table.intern(state) for state in unique_states.tolist()], dtype=np.int64)
+
+    # One key per (row, action); average the deltas landing on each
+    keys = row_ids[state_index] * table.num_actions + actions
+    unique_keys, key_index = np.unique(keys, return_inverse=True)
+    weighted = np.bincount(key_index, weights=changes * visits)
+    total_visits = np.bincount(key_index, weights=visits)
+
+    merged_rows, merged_actions = np.divmod(unique_keys, table.num_actions)
+    table.values[merged_rows, merged_actions] += (weighted / total_visits).astype(table.dtype)
+    table.touch(merged_rows)
+    return table.states[merged_rows], merged_actions, table.values[merged_rows, merged_actions]
+
+
+def train(table, workers, rounds, games_per_round, maze_size=15, ai_modify_frequency=3, player="random",
+          epsilon=0.2, max_moves=300, seed=0, report=print):
+    """Run self-play rounds across worker processes, merging into table after each
+
+    Returns a dict of totals (moves, Q updates, wins, wall time).
+    """
+    if player not in PLAYERS:
+        raise ValueError(f"Unknown player {player!r}, expected one of {PLAYERS}")
+    if table.num_actions != maze_size * maze_size * 2:
+        raise ValueError(f"Q-table has {table.num_actions} actions, expected {maze_size * maze_size * 2}")
+
+    worker_seeds = np.random.SeedSequence(seed).generate_state(workers, dtype=np.uint64)
+    context = multiprocessing.get_context("spawn")
+    connections = []
+    processes = []
+    for worker_id in range(workers):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(
+            target=_worker_main,
+            args=(child_conn, worker_id, int(worker_seeds[worker_id]), maze_size, ai_modify_frequency,
+                  player, epsilon, max_moves),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        connections.append(parent_conn)
+        processes.append(process)
+
+    # Warm start: every worker begins from the whole table
+    merged = None
+    if len(table):
+        states = np.repeat(table.states[:len(table)], table.num_actions)
+        actions = np.tile(np.arange(table.num_actions), len(table))
+        merged = (states, actions, np.asarray(table.values[:len(table)]).reshape(-1))
+
+    totals = {"moves": 0, "updates": 0, "wins": 0, "games": 0}
+    started = time.perf_counter()
+    try:
+        for round_number in range(1, rounds + 1):
+            round_started = time.perf_counter()
+            for conn in connections:
+                conn.send((games_per_round, merged))
+            results = [conn.recv() for conn in connections]
+
+            deltas = [result[0] for result in results]
+            merged = merge_deltas(table, deltas)
+            table.flush()
+
+            moves = sum(result[1]["moves"] for result in results)
+            updates = int(sum(d[3].sum() for d in deltas))
+            wins = sum(result[1]["wins"] for result in results)
+            totals["moves"] += moves
+            totals["updates"] += updates
+            totals["wins"] += wins
+            totals["games"] += workers * games_per_round
+
+            elapsed = time.perf_counter() - round_started
+            report(f"round {round_number:>4}: {moves / elapsed:>10,.0f} moves/s  {updates / elapsed:>9,.0f} Q updates/s  "
+                   f"merged {len(merged[0]):>6} entries  states {len(table):>7}  wins {wins}")
+    finally:
+        for conn in connections:
+            conn.send(None)
+        for process in processes:
+            process.join()
+
+    totals["seconds"] = time.perf_counter() - started
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process self-play trainer for the MindMaze AI")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--rounds", type=int, default=20, help="merge rounds")
+    parser.add_argument("--games", type=int, default=10, help="games per worker per round")
+    parser.add_argument("--size", type=int, default=15, help="board width and height")
+    parser.add_argument("--player", choices=PLAYERS, default="random", help="scripted player policy")
+    parser.add_argument("--epsilon", type=float, default=0.2, help="random move chance of the greedy player")
+    parser.add_argument("--max-moves", type=int, default=300, help="moves before a game is abandoned")
+    parser.add_argument("--seed", type=int, default=0, help="root seed for the workers")
+    parser.add_argument("--q-table", help="persistent Q-table directory to train (in memory if omitted)")
+    args = parser.parse_args()
+
+    num_actions = args.size * args.size * 2
+    if args.q_table:
+        table = PersistentQTable(args.q_table, num_actions, args.size, args.size)
+    else:
+        table = QTable(num_actions)
+
+    totals = train(table, args.workers, args.rounds, args.games, args.size, player=args.player,
+                   epsilon=args.epsilon, max_moves=args.max_moves, seed=args.seed)
+    print(f"{args.workers} workers: {totals['games']} games, {totals['moves']} moves, "
+          f"{totals['updates']} Q updates in {totals['seconds']:.1f} s "
+          f"({totals['moves'] / totals['seconds']:,.0f} moves/s, "
+          f"{totals['updates'] / totals['seconds']:,.0f} Q updates/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,47 @@
 import pygame
+from collections import OrderedDict
+
+# Fonts shared by every UI element, keyed by (name, size)
+_fonts = {}
+
+def get_font(name, size):
+    """Get a shared SysFont, looking it up only the first time it is asked for"""
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size)
+        _fonts[key] = font
+    return font
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed by (font, text, colour)
+
+    Static labels are rasterized once and then only blitted; changing text such
+    as the turn counter just cycles through the least recently used entries.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+# One cache for the whole UI
+text_cache = TextCache()
+
+def render_text(font, text, color):
+    """Render antialiased text through the shared cache"""
+    return text_cache.render(font, text, color)
 
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color, text_color):
@@ -8,7 +51,7 @@ class Button:
         self.hover_color = hover_color
         self.text_color = text_color
         self.is_hovered = False
-        self.font = pygame.font.SysFont('Arial', 20)
+        self.font = get_font('Arial', 20)
         
     def draw(self, screen):
         # Draw the button
@@ -17,7 +60,7 @@ class Button:
         pygame.draw.rect(screen, (0, 0, 0), self.rect, 2)  # Border
         
         # Draw text
-        text_surface = self.font.render(self.text, True, self.text_color)
+        text_surface = render_text(self.font, self.text, self.text_color)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
     
@@ -60,9 +103,9 @@ class MenuSystem:
         }
         
         # Title font
-        self.title_font = pygame.font.SysFont('Arial', 48)
-        self.subtitle_font = pygame.font.SysFont('Arial', 24)
-        self.instruction_font = pygame.font.SysFont('Arial', 20)
+        self.title_font = get_font('Arial', 48)
+        self.subtitle_font = get_font('Arial', 24)
+        self.instruction_font = get_font('Arial', 20)
         
     def handle_event(self, event):
         """Handle mouse events for the menu"""
@@ -86,12 +129,12 @@ class MenuSystem:
         screen.fill((0, 0, 0))
         
         # Draw title
-        title_surface = self.title_font.render("MindMaze: AI-Powered Labyrinth", True, (255, 255, 255))
+        title_surface = render_text(self.title_font, "MindMaze: AI-Powered Labyrinth", (255, 255, 255))
         title_rect = title_surface.get_rect(center=(self.screen_width // 2, self.screen_height // 4 - 30))
         screen.blit(title_surface, title_rect)
         
         # Draw subtitle
-        subtitle_surface = self.subtitle_font.render("Navigate the shifting maze controlled by AI", True, (200, 200, 200))
+        subtitle_surface = render_text(self.subtitle_font, "Navigate the shifting maze controlled by AI", (200, 200, 200))
         subtitle_rect = subtitle_surface.get_rect(center=(self.screen_width // 2, self.screen_height // 4 + 20))
         screen.blit(subtitle_surface, subtitle_rect)
         
@@ -106,7 +149,7 @@ class MenuSystem:
         
         y_offset = self.screen_height // 4 + 80
         for instruction in instructions:
-            instruction_surface = self.instruction_font.render(instruction, True, (180, 180, 180))
+            instruction_surface = render_text(self.instruction_font, instruction, (180, 180, 180))
             instruction_rect = instruction_surface.get_rect(center=(self.screen_width // 2, y_offset))
             screen.blit(instruction_surface, instruction_rect)
             y_offset += 30
@@ -121,7 +164,8 @@ class Legend:
         self.y = y
         self.square_size = square_size // 2
         self.padding = 5
-        self.font = pygame.font.SysFont('Arial', 16)
+        self.font = get_font('Arial', 16)
+        self.background = None  # Built on first draw, once the item count is known
         
     def draw(self, screen, items):
         """Draw the color legend
@@ -130,13 +174,14 @@ class Legend:
         # Draw legend background
         legend_width = 160
         legend_height = len(items) * (self.square_size + self.padding * 2) + self.padding * 2
-        legend_surface = pygame.Surface((legend_width, legend_height))
-        legend_surface.fill((40, 40, 40))
-        legend_surface.set_alpha(220)
-        screen.blit(legend_surface, (self.x, self.y))
+        if self.background is None or self.background.get_height() != legend_height:
+            self.background = pygame.Surface((legend_width, legend_height))
+            self.background.fill((40, 40, 40))
+            self.background.set_alpha(220)
+        screen.blit(self.background, (self.x, self.y))
         
         # Draw title
-        title_text = self.font.render("LEGEND:", True, (255, 255, 255))
+        title_text = render_text(self.font, "LEGEND:", (255, 255, 255))
         screen.blit(title_text, (self.x + 10, self.y + 10))
         
         # Draw items
@@ -154,7 +199,7 @@ class Legend:
                               (self.x + 10, y_offset, self.square_size, self.square_size))
                 
             # Draw description text
-            text = self.font.render(f"{description}", True, (255, 255, 255))
+            text = render_text(self.font, f"{description}", (255, 255, 255))
             screen.blit(text, (self.x + 20 + self.square_size, y_offset + 2))
             
             y_offset += self.square_size + self.padding * 2
\ No newline at end of file
@@ -0,0 +1,84 @@
+import pygame
+
+
+class Viewport:
+    """Camera over the maze: which part of the board is on screen, and how big a cell is
+
+    A board that fits on screen is centred, the way the game has always drawn it.
+    A larger board scrolls: the camera re-centres on the player whenever they get
+    within `margin` cells of the screen edge, so it jumps now and then instead of
+    moving (and forcing a full repaint) on every step.
+    """
+
+    def __init__(self, screen_rect, maze_width, maze_height, cell_size,
+                 min_cell_size=4, max_cell_size=64, margin=3):
+        self.rect = pygame.Rect(screen_rect)
+        self.maze_width = maze_width
+        self.maze_height = maze_height
+        self.cell_size = cell_size
+        self.min_cell_size = min_cell_size
+        self.max_cell_size = max_cell_size
+        self.margin = margin
+
+        # Screen position of the maze's top-left corner
+        self.offset_x = 0
+        self.offset_y = 0
+        self.center_on(maze_width // 2, maze_height // 2)
+
+    def center_on(self, x, y):
+        """Scroll so cell (x, y) is as close to the middle of the screen as the board allows"""
+        cell = self.cell_size
+        self.offset_x = self._clamp_offset(
+            self.rect.centerx - x * cell - cell // 2, self.rect.left, self.rect.width, self.maze_width * cell
+        )
+        self.offset_y = self._clamp_offset(
+            self.rect.centery - y * cell - cell // 2, self.rect.top, self.rect.height, self.maze_height * cell
+        )
+
+    def _clamp_offset(self, offset, start, length, maze_length):
+        """Keep the board filling the screen along one axis, or centre it if it is too small"""
+        if maze_length <= length:
+            return start + (length - maze_length) // 2
+        return min(start, max(start + length - maze_length, offset))
+
+    def follow(self, x, y):
+        """Keep cell (x, y) away from the screen edges; returns True if the camera moved"""
+        rect = self.cell_rect(x, y)
+        border = self.margin * self.cell_size
+        inner = self.rect.inflate(-2 * border, -2 * border)
+        if inner.width > 0 and inner.height > 0 and inner.contains(rect):
+            return False
+
+        old_offset = (self.offset_x, self.offset_y)
+        self.center_on(x, y)
+        return (self.offset_x, self.offset_y) != old_offset
+
+    def zoom(self, factor, focus):
+        """Scale cells by factor within the size limits, keeping cell `focus` in view
+
+        Returns True if the cell size changed.
+        """
+        cell_size = int(round(self.cell_size * factor))
+        if cell_size == self.cell_size:
+            cell_size += 1 if factor > 1 else -1
+        cell_size = max(self.min_cell_size, min(self.max_cell_size, cell_size))
+        if cell_size == self.cell_size:
+            return False
+
+        self.cell_size = cell_size
+        self.center_on(*focus)
+        return True
+
+    def cell_rect(self, x, y):
+        """Rect of cell (x, y) on the screen"""
+        cell = self.cell_size
+        return pygame.Rect(self.offset_x + x * cell, self.offset_y + y * cell, cell, cell)
+
+    def visible_cells(self):
+        """Range of cells on screen, as (x0, y0, x1, y1) with exclusive ends"""
+        cell = self.cell_size
+        x0 = max(0, (self.rect.left - self.offset_x) // cell)
+        y0 = max(0, (self.rect.top - self.offset_y) // cell)
+        x1 = min(self.maze_width, -(-(self.rect.right - self.offset_x) // cell))
+        y1 = min(self.maze_height, -(-(self.rect.bottom - self.offset_y) // cell))
+        return x0, y0, x1, y1